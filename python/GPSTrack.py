@@ -1,22 +1,83 @@
+import io
+import os
+import gzip
+import zipfile
+import contextlib
+import concurrent.futures
+import numpy as np
 from Waypoint import *
+from geodesy import *
+from NMEA import *
+from LOCUS import *
+from TrackCache import *
+from SpatialIndex import *
+from simplify import *
+from elevation import *
+from KML import *
+
+# bump whenever parsers output changes, invalidates cached tracks
+PARSER_VERSION = 5
 
 class GPSTrack:
 	"""
-	GPS track is a list of GPS waypoints
+	GPS track is a list of GPS waypoints,
+	stored as typed columns (see COLUMNS).
+	Waypoint objects are only created
+	when indexing or iterating
 	"""
 	
-	def __init__(self, fp):
+	def __init__(self, fp=None, cache=True):
 		"""
 		Builds GPS Track by parsing all waypoints
-		in either NMEA or KML file
+		in either NMEA or KML file,
+		builds an empty track if no file is given.
+		cache: True to use the default TrackCache,
+		a TrackCache instance or False to always parse
+		"""
+		self._size = 0
+		self._data = {}
+		for (name, dtype) in COLUMNS:
+			self._data[name] = np.empty(0, dtype=dtype)
+		self._timeOrder = False # time index, built on demand
+		self._spatialIndex = None # built on demand
+		self._simplified = {} # simplifications, per method & tolerance
+		self._derived = {} # memoized statistics: name -> [valid rows, value]
+		self.cacheHits = 0
+		self.cacheMisses = 0
+
+		if (fp is None):
+			return
+
+		if (cache is True):
+			cache = TrackCache.default()
+		if (cache):
+			key = cache.key(fp, PARSER_VERSION) # taken before parsing
+			fix = cache.load(fp, PARSER_VERSION, key)
+			if (fix is not None):
+				for (name, _) in COLUMNS:
+					self._data[name] = getattr(fix, name) # read only, copied on write
+				self._size = len(fix.lat)
+				return
+
+		day = today() # given to fixes without date (GGA only NMEA, KML without <when>)
+		self.parse(fp)
+		if (cache and (key is not None) and not(np.any(self.column("time") >= day))):
+			# tracks dated by today() would be stale on later days: not cached
+			cache.store(fp, self.columns(), PARSER_VERSION, key)
+
+	def parse(self, fp):
+		"""
+		Parses all waypoints in given
+		NMEA, KML or LOCUS file into self
 		"""
-		self.waypoints = []
-
 		ext = fp.split('.')[-1]
+		if (fp.endswith('.kml.gz')):
+			ext = 'kml'
+
 		if (ext == 'nmea'):
 			self.GPSTrackNMEA(fp)
 		
-		elif (ext == 'kml'):
+		elif (ext in ['kml', 'kmz']):
 			self.GPSTrackKML(fp)
 		
 		elif (ext == 'locus'):
@@ -25,220 +86,351 @@ class GPSTrack:
 		else:
 			raise ValueError("GPS Track cannot be built from a '.{:s}' log file".format(ext))
 
+	@classmethod
+	def fromFiles(cls, paths, workers=None):
+		"""
+		Builds a single GPS Track from several
+		NMEA, KML or LOCUS files, parsed in parallel
+		by up to workers processes (defaults to CPU count).
+		Waypoints are merged in timestamp order
+		"""
+		paths = list(paths)
+		if (workers is None):
+			workers = os.cpu_count() or 1
+		workers = min(workers, len(paths))
+		
+		if (workers <= 1):
+			parsed = [loadColumns(fp) for fp in paths]
+		else:
+			with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+				chunksize = max(1, len(paths)//(4*workers))
+				parsed = list(pool.map(loadColumns, paths, chunksize=chunksize))
+
+		track = cls()
+		if (len(parsed) == 0):
+			return track
+		merged = Fix(*[np.concatenate([getattr(fix, name) for fix in parsed]) for (name, _) in COLUMNS])
+		order = np.argsort(merged.time, kind="stable")
+		track.extend(Fix(*[column[order] for column in merged]))
+		return track
+
 	def GPSTrackNMEA(self, fp):
 		"""
 		Builds GPS Track by parsing all waypoints
 		in .nmea log file
 		"""
-		fd = open(fp,"r")
-		for line in fd:
-			line = line.strip()
-			try:
-				self.waypoints.append(Waypoint(nmea=line))
-			except NameError: # not $GGA or $RMC frame
-				pass
-
-		fd.close()
+		for batch in mapNMEA(fp):
+			self.extend(batch)
 
 	def GPSTrackKML(self, fp):
 		"""
 		Builds GPS Track by parsing all waypoints
-		in .kml log file
+		in .kml (.kmz, .kml.gz) file
 		"""
-		fd = open(fp,"r")
-		coordinates_found = False
-		for line in fd:
-			line = line.strip()
-		
-			if (not(coordinates_found)):
-				if ("<coordinates>" in line):
-					coordinates_found = True
-		
-			else:
-				if ("</coordinates>" in line):
-					break
-				else:
-					parsed = line.split(",")
-					lat = float(parsed[1])
-					lon = float(parsed[0])
-					alt = parsed[2]
-					self.waypoints.append(Waypoint(latDeg=lat,lonDeg=lon,alt=alt))
-
-		fd.close()
+		for batch in iterKML(fp):
+			self.extend(batch)
 
 	def GPSTrackLOCUS(self, fp):
 		"""
 		Builds GPS Track by parsing all waypoints
 		in .locus log file
 		"""
-		fd = open(fp,"r")
-		for line in fd:
-			line = line.strip()
-
-			if (not(line.startswith("$PMTKLOX,1"))):
-				# non valid locus log
-				continue
-
-			# locus payload parsing
-			content = line.split(",")
-			checksum = content[-1].split("*")[-1]
-			expected = Waypoint.checksum(line)
-			if (checksum != expected):
-				# checksum is faulty, discard this line
-				continue
-			
-			content = content[3:] # remove header, type & line number
-			content[-1] = content[-1].split("*")[0] # remove checksum value
-			
-			# one line in locus contains 6 waypoints
-			# build byte array for this line
-			_bytes = []
-			for c in content:
-				for i in range(0, 4): # 4*2 characters
-					_offset = int(i*2) # slice 2 by 2 characthers (hex format)
-					_bytes.append(int(c[_offset:_offset+2],16))
-
-			N = int(len(content)/4) # number of records for this line
-			for i in range(0,N): 
-				try: 
-					self.waypoints.append(Waypoint(locus=_bytes))
-				except ValueError:
-					# missing GPS fix, discard this one 
-					pass
-
-				_bytes = _bytes[16:] # shift used bytes
-
-		fd.close()
+		self.extend(decodeLOCUS(fp))
+
+	@staticmethod
+	def waypointToFix(wp):
+		"""
+		Converts a Waypoint into a track row
+		"""
+		[lat, lon] = wp.toDecimalDegrees()
+		speed = wp.speed
+		if (speed is None):
+			speed = float("nan")
+		return Fix(lat, lon, wp.getAltitude(), wp.time, speed)
+
+	@staticmethod
+	def fixToWaypoint(fix):
+		"""
+		Converts a track row into a Waypoint
+		"""
+		speed = float(fix.speed)
+		if (speed != speed): # NaN: unknown
+			speed = None
+		wp = Waypoint(latDeg=fix.lat, lonDeg=fix.lon, alt=fix.alt, speed=speed)
+		wp.time = int(fix.time)
+		return wp
+
+	def column(self, name):
+		"""
+		Returns (read only) view of
+		given column, see COLUMNS
+		"""
+		view = self._data[name][:self._size]
+		view.flags.writeable = False
+		return view
+
+	def columns(self):
+		"""
+		Returns all columns as a Fix of arrays
+		"""
+		return Fix(*[self.column(name) for (name, _) in COLUMNS])
+
+	def row(self, index):
+		"""
+		Returns row at given index as a Fix of scalars
+		"""
+		index = self._index(index)
+		return Fix(*[self._data[name][index] for (name, _) in COLUMNS])
+
+	def _index(self, index):
+		""" Resolves (negative) index, raises IndexError """
+		if (index < 0):
+			index += self._size
+		if ((index < 0) or (index >= self._size)):
+			raise IndexError("GPS track index out of range")
+		return index
+
+	def _reserve(self, size):
+		"""
+		Grows columns capacity so they can
+		hold at least size rows
+		"""
+		capacity = len(self._data["lat"])
+		if (size <= capacity):
+			return
+		capacity = max(size, 2*capacity, 16)
+		for (name, dtype) in COLUMNS:
+			column = np.empty(capacity, dtype=dtype)
+			column[:self._size] = self._data[name][:self._size]
+			self._data[name] = column
+
+	def _writable(self):
+		"""
+		Copies columns memory mapped from
+		cache (read only) on first edit
+		"""
+		if (not(self._data["lat"].flags.writeable)):
+			for (name, _) in COLUMNS:
+				self._data[name] = np.array(self._data[name])
+
+	def _appendRow(self, fix):
+		""" Appends a single row to columns """
+		self._writable()
+		self._reserve(self._size+1)
+		for (name, _) in COLUMNS:
+			self._data[name][self._size] = getattr(fix, name)
+		self._size += 1
+		self._edited(self._size-1, self._size)
+
+	def extend(self, fix):
+		"""
+		Appends rows given as a Fix of arrays
+		"""
+		n = len(fix.lat)
+		if (n == 0):
+			return
+		self._writable()
+		self._reserve(self._size+n)
+		for (name, _) in COLUMNS:
+			self._data[name][self._size:self._size+n] = getattr(fix, name)
+		self._size += n
+		self._edited(self._size-n, self._size)
+
+	def _edited(self, start, stop):
+		"""
+		Called after rows [start, stop[ have been
+		written (start == stop: rows removed at start),
+		keeps derived indexes consistent
+		"""
+		self._spatialIndex = None
+		self._simplified = {}
+		for entry in self._derived.values():
+			# statistics still hold for rows before start
+			entry[0] = min(entry[0], start)
+		if (self._timeOrder is None):
+			# track was sorted by date: still is if edited rows fit in
+			time = self._data["time"][max(start-1, 0):min(stop+1, self._size)]
+			if (np.any(time[1:] < time[:-1])):
+				self._timeOrder = False
+		else:
+			self._timeOrder = False
+
+	def _toFix(self, waypoints):
+		"""
+		Converts a waypoint, a list of waypoints
+		or a track into a Fix of arrays
+		"""
+		if (isinstance(waypoints, GPSTrack)):
+			return waypoints.columns()
+		if (isinstance(waypoints, Waypoint)):
+			waypoints = [waypoints]
+		return stackFixes([self.waypointToFix(wp) for wp in waypoints])
 
 	def __len__(self):
 		""" GPS Track lenght returns number of waypoints """
-		return len(self.waypoints)
+		return self._size
 
 	def __iter__(self):
 		""" Iterator over GPS track """
-		return iter(self.waypoints)
+		for i in range(0, self._size):
+			yield self.fixToWaypoint(self.row(i))
 
 	def __reversed__(self):
 		""" Iterates backwards over GPS track """
-		return reversed(self.waypoints)
+		for i in range(self._size-1, -1, -1):
+			yield self.fixToWaypoint(self.row(i))
 
 	def __setitem__(self, index, wp):
 		""" Sets waypoint at given index in track """
-		self.waypoints[index] = wp
+		index = self._index(index)
+		fix = self.waypointToFix(wp)
+		self._writable()
+		for (name, _) in COLUMNS:
+			self._data[name][index] = getattr(fix, name)
+		self._edited(index, index+1)
 
 	def __getitem__(self, index):
-		""" Returns waypoint in GPS track at given index """
-		return self.waypoints[index]
+		""" 
+		Returns waypoint in GPS track at given index,
+		list of waypoints for a slice.
+		Returned waypoints are copies:
+		use __setitem__ to modify the track
+		"""
+		if (isinstance(index, slice)):
+			return [self[i] for i in range(*index.indices(self._size))]
+		return self.fixToWaypoint(self.row(index))
 	
 	def __delitem__(self, index):
-		""" Removes given waypoint in track """
-		del self.waypoints[index]
+		""" Removes given waypoint(s) in track """
+		if (isinstance(index, slice)):
+			removed = range(*index.indices(self._size))
+			if (len(removed) == 0):
+				return
+			start = min(removed[0], removed[-1])
+		else:
+			index = start = self._index(index)
+		for (name, _) in COLUMNS:
+			self._data[name] = np.delete(self._data[name][:self._size], index)
+		self._size = len(self._data["lat"])
+		self._edited(start, start)
 
 	def __str__(self):
 		string = "--- GPS Track ---\n"
-		for i in range(0, len(self.waypoints)):
-			string += str(self.waypoints[i])
+		for wp in self:
+			string += str(wp)
 		string += "----------------"
 		return string
 
+	@property
+	def waypoints(self):
+		""" All waypoints contained in track """
+		return self.getWaypoints()
+
 	def getWaypoints(self):
 		"""
 		Returns all waypoints contained in track
 		"""
-		return self.waypoints
+		return list(self)
 
 	def append(self, waypoints):
 		"""
-		Appends waypoint or list of waypoints
-		to self
+		Appends waypoint, list of waypoints
+		or GPS track to self
 		"""
-		self.waypoints.append(waypoints)
+		self.extend(self._toFix(waypoints))
 	
 	def prepend(self, waypoints):
 		"""
-		Prepends waypoint or list of waypoints
-		to self
+		Prepends waypoint, list of waypoints
+		or GPS track to self
 		"""
-		self.waypoints.insert(0, waypoints)
+		self.insert(0, waypoints)
 
 	def insert(self, index, waypoints):
 		"""
-		Inserts waypoint or list of waypoints
-		at given position
+		Inserts waypoint, list of waypoints
+		or GPS track at given position
 		"""
-		self.waypoints.insert(index, waypoints)
+		fix = self._toFix(waypoints)
+		index = min(max(index if (index >= 0) else index+self._size, 0), self._size)
+		for (name, _) in COLUMNS:
+			self._data[name] = np.insert(self._data[name][:self._size], index, getattr(fix, name))
+		self._size = len(self._data["lat"])
+		self._edited(index, index+len(fix.lat))
 
 	def toKML(self, fp):
 		"""
-		Writes GPS track in a KML file
-		"""
-		fd = open(fp, "w")
-
-		# initialize kml file
-		fd.write('<?xml version="1.0" encoding="UTF-8"?>\n')
-		fd.write('<kml xmlns="http://earth.google.com/kml/2.2" xmlns:gx="http://www.google.com/kml/ext/2.2">\n')
-		fd.write('<Folder>\n')
-
-		# track infos
-		fd.write('\t<name>Imported from {:s}</name>\n'.format(fp))
-		fd.write('\t<Placemark>\n')
-		fd.write('\t\t<name>Track</name>\n')
-
-		# track style
-		fd.write('\t\t<Style>\n')
-		fd.write('\t\t\t<LineStyle>\n')
-		fd.write('\t\t\t\t<color>00cc00cc</color>\n')
-		fd.write('\t\t\t\t<width>4</width>\n')
-		fd.write('\t\t\t</LineStyle>\n')
-		fd.write('\t\t</Style>\n')
-
-		# track
-		fd.write('\t\t<LineString>\n')
-		fd.write('\t\t\t<altitudeMode>relativeToGround</altitudeMode>\n')
-		fd.write('\t\t\t<coordinates>\n')
-
-		for i in range(0, len(self.waypoints)):
-			[lat, lon] = self.waypoints[i].toDecimalDegrees()
-			fd.write('\t\t\t\t{:f},{:f},{:s}\n'.format(lon,lat,self.waypoints[i].getAltitude()))
-
-		fd.write('\t\t\t</coordinates>\n')
-		fd.write('\t\t</LineString>\n')
-		
-		# finalize kml file 
-		fd.write('\t</Placemark>\n')
-		fd.write('\t</Folder>\n')
-		fd.write('</kml>\n')
-		fd.close()
-		print("GPS track written into {:s}".format(fp))
+		Writes GPS track in a KML file,
+		fp: path or file object. A '.kmz' path is
+		written zipped, a '.gz' path gzipped
+		"""
+		with exportStream(fp, "doc.kml") as fd:
+			name = exportName(fp)
+			# initialize kml file
+			fd.write(
+				'<?xml version="1.0" encoding="UTF-8"?>\n'
+				'<kml xmlns="http://earth.google.com/kml/2.2" xmlns:gx="http://www.google.com/kml/ext/2.2">\n'
+				'<Folder>\n'
+				# track infos
+				'\t<name>Imported from {:s}</name>\n'
+				'\t<Placemark>\n'
+				'\t\t<name>Track</name>\n'
+				# track style
+				'\t\t<Style>\n'
+				'\t\t\t<LineStyle>\n'
+				'\t\t\t\t<color>00cc00cc</color>\n'
+				'\t\t\t\t<width>4</width>\n'
+				'\t\t\t</LineStyle>\n'
+				'\t\t</Style>\n'
+				# track
+				'\t\t<LineString>\n'
+				'\t\t\t<altitudeMode>relativeToGround</altitudeMode>\n'
+				'\t\t\t<coordinates>\n'.format(name)
+			)
+			
+			fd.writelines(formatChunks('\t\t\t\t%f,%f,%g\n',
+				[self.column("lon"), self.column("lat"), self.column("alt")]))
+
+			# finalize kml file 
+			fd.write(
+				'\t\t\t</coordinates>\n'
+				'\t\t</LineString>\n'
+				'\t</Placemark>\n'
+				'\t</Folder>\n'
+				'</kml>\n'
+			)
 
 	def toGPX(self, fp):
 		"""
-		Writes GPS track in a GPX file
-		"""
-		fd = open(fp,"w")
-		fd.write('<?xml version="1.0" encoding="UTF-8"?>\n')
-		fd.write('<gpx version="1.0" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"\n')
-		fd.write(' xmlns="http://www.topografix.com/GPX/1/0"\n')
-		fd.write(' xsi:schemaLocation="http://www.topografix.com/GPX/1/0 http://www.topografix.com/GPX/1/0/gpx.xsd">\n')
-
-		fd.write('\t<name>{:s}</name>\n'.format(fp))
-		fd.write('\t<desc>Imported from {:s}</desc>\n'.format(fp))
-		fd.write('\t<trk>\n')
-		fd.write('\t\t<name>GPS Track</name>\n')
-		fd.write('\t\t<number>1</number>\n')
-		fd.write('\t\t<trkseg>\n')
-	
-		for i in range(0, len(self.waypoints)):
-			[lat, lon] = self.waypoints[i].toDecimalDegrees()
-			fd.write('\t\t\t<trkpt lat="{:f}" lon="{:f}">\n'.format(lat,lon))
-			fd.write('\t\t\t\t<ele>{:s}</ele>\n'.format(self.waypoints[i].getAltitude()))
-			fd.write('\t\t\t</trkpt>\n')
-			
-		fd.write('\t\t</trkseg>\n')
-		fd.write('\t</trk>\n')
-		fd.write('</gpx>')
-		fd.close()
-		print("GPS Track written into {:s}".format(fp))
+		Writes GPS track in a GPX file,
+		fp: path or file object. A '.gz' path is written gzipped
+		"""
+		with exportStream(fp, "track.gpx") as fd:
+			name = exportName(fp)
+			fd.write(
+				'<?xml version="1.0" encoding="UTF-8"?>\n'
+				'<gpx version="1.0" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"\n'
+				' xmlns="http://www.topografix.com/GPX/1/0"\n'
+				' xsi:schemaLocation="http://www.topografix.com/GPX/1/0 http://www.topografix.com/GPX/1/0/gpx.xsd">\n'
+				'\t<name>{:s}</name>\n'
+				'\t<desc>Imported from {:s}</desc>\n'
+				'\t<trk>\n'
+				'\t\t<name>GPS Track</name>\n'
+				'\t\t<number>1</number>\n'
+				'\t\t<trkseg>\n'.format(name, name)
+			)
+		
+			fd.writelines(formatChunks(
+				'\t\t\t<trkpt lat="%f" lon="%f">\n'
+				'\t\t\t\t<ele>%g</ele>\n'
+				'\t\t\t</trkpt>\n',
+				[self.column("lat"), self.column("lon"), self.column("alt")]))
+				
+			fd.write(
+				'\t\t</trkseg>\n'
+				'\t</trk>\n'
+				'</gpx>'
+			)
 
 	def toCSV(self, fp):
 		"""
@@ -246,135 +438,195 @@ class GPSTrack:
 		line0: titles[0], titles[1], .., titles[n-1]
 		line[1]: data[0][0], ..., data[0][n-1]
 		line[l-1]: data[l-1][0], ..., data[l-1][n-1]
+		fp: path or file object. A '.gz' path is written gzipped
 		"""
-		fd = open(fp,"w")
-		line = ""
-		fd.write("lat,lon,alt\n") # add 'label' here to view extra info
-	
-		for i in range(0, len(self.waypoints)):
-			[lat, lon] = self.waypoints[i].toDecimalDegrees()
-			line = "{:f},{:f},{:s}\n".format(lat,lon,self.waypoints[i].getAltitude())
-			fd.write(line)
-		fd.close()
+		with exportStream(fp, "track.csv") as fd:
+			fd.write("lat,lon,alt\n") # add 'label' here to view extra info
+			fd.writelines(formatChunks("%f,%f,%g\n",
+				[self.column("lat"), self.column("lon"), self.column("alt")]))
 
-	def drawOnMap(self, map):
+	def drawOnMap(self, map, zoom=11, tolerance=None):
 		"""
-		Draws GPS track on map using qMap
+		Draws GPS track on map using qMap:
+		whole track is sent as a single polyline,
+		simplified within tolerance [m] (defaults to
+		one pixel at given zoom level, 0: all waypoints),
+		plus start, end, highest & lowest markers
 		TODO:
 			+ zoom: should be based on totalDistance()
 		"""
-		
-		map.setZoom(11)
-		
-		# track visualization
-		for i in range(0, len(self.waypoints)):
-			[l,L] = self.waypoints[i].toDecimalDegrees()
-			if (i==0):
-				icon = "http://maps.google.com/mapfiles/kml/pal2/icon5.png"
-				[l0, L0] = [l,L]
-			elif (i==len(self.waypoints)-1):
-				icon = "http://maps.google.com/mapfiles/kml/pal2/icon13.png"
-			else:
-				icon = "http://labs.google.com/ridefinder/images/mm_20_gray.png"
+		map.setZoom(zoom)
+		if (len(self) == 0):
+			return
+
+		lats = self.column("lat")
+		lons = self.column("lon")
+		if (tolerance is None):
+			tolerance = metersPerPixel(zoom, float(lats[0]))
+		if (tolerance > 0):
+			indexes = self.simplify(tolerance)
+		else:
+			indexes = np.arange(len(self))
+
+		# track visualization, one round trip
+		map.runScript(polylineScript("track", lats[indexes], lons[indexes], "#cc00cc", 4))
 
-			map.addMarker("{:d}".format(i), l, L,
+		# special markers
+		markers = [
+			["start", 0, "http://maps.google.com/mapfiles/kml/pal2/icon5.png"],
+			["end", len(self)-1, "http://maps.google.com/mapfiles/kml/pal2/icon13.png"],
+			["highest", self.highestPoint(), "http://labs.google.com/ridefinder/images/mm_20_blue.png"],
+			["lowest", self.lowestPoint(), "http://labs.google.com/ridefinder/images/mm_20_purple.png"],
+		]
+		for [key, index, icon] in markers:
+			map.addMarker(key, float(lats[index]), float(lons[index]),
 				**dict(
 					icon=icon,
 					draggable=False,
-					title="Waypoint {:d}".format(i)
+					title=key
 				)
 			)
 
-		# special markers
-		index = self.highestPoint()
-		[l, L] = self.waypoints[index].toDecimalDegrees()
-		icon="http://labs.google.com/ridefinder/images/mm_20_blue.png"
-		map.addMarker("highest", l, L,
-			**dict(
-				icon=icon,
-				draggable=False,
-				title="highest"
-			)
-		)
-
-		index = self.lowestPoint()
-		[l, L] = self.waypoints[index].toDecimalDegrees()
-		icon="http://labs.google.com/ridefinder/images/mm_20_purple.png"
-		map.addMarker("lowest", l, L,
-			**dict(
-				icon=icon,
-				draggable=False,
-				title="lowest"
-			)
-		)
-
-		map.centerAt(l0,L0)
+		map.centerAt(float(lats[0]), float(lons[0]))
 		map.center()
 		map.waitUntilReady()
 
-	def highlightOnMap(self, map, index1, index2, icon=None):
+	def highlightOnMap(self, map, index1, index2, color=None):
 		"""
-		Highlist given waypoints on map
-		between given indexes (included)
+		Highlights track on map
+		between given indexes (included),
+		as a single polyline
 		"""
+		if (color is None):
+			color = "#ff8800"
 
-		if (icon is None):
-			icon="http://maps.gstatic.com/mapfiles/ridefinder-images/mm_20_orange.png"
+		[index1, index2] = sorted([index1, index2])
+		lats = self.column("lat")[index1:index2+1]
+		lons = self.column("lon")[index1:index2+1]
+		map.runScript(polylineScript("highlight", lats, lons, color, 6))
 
-		for i in range(index1,index2):
-			[l, L] = self.waypoints[i].toDecimalDegrees()
+	def clearMap(self, map):
+		"""
+		Removes track & markers drawn on map
+		"""
+		map.runScript(polylineScript("track", [], []) + polylineScript("highlight", [], []))
+		for key in ["start", "end", "highest", "lowest"]:
+			map.deleteMarker(key)
 
-			map.addMarker("highlight{:d}".format(i), l, L,
-				**dict(
-					icon=icon,
-					draggable=False,
-					title="highlight{:d}".format(i)
-				)
-			)
+	def _memoized(self, name):
+		"""
+		Returns [rows, value] of memoized statistic,
+		value still holds for the first rows of track.
+		[0, None] if never computed
+		"""
+		entry = self._derived.get(name, [0, None])
+		if ((entry[1] is not None) and (entry[0] == self._size)):
+			self.cacheHits += 1
+		else:
+			self.cacheMisses += 1
+		return entry
 
 	def elevationProfile(self):
 		"""
 		Returns all waypoints altitude
 		"""
-		elevation = []
-		for i in range(0, len(self.waypoints)):
-			elevation.append(float(self.waypoints[i].getAltitude()))
-		return elevation
+		[rows, profile] = self._memoized("elevationProfile")
+		if (profile is None):
+			profile = []
+		if ((rows < self._size) or (len(profile) != rows)):
+			del profile[rows:]
+			profile.extend(self.column("alt")[rows:].tolist())
+			self._derived["elevationProfile"] = [self._size, profile]
+		return list(profile)
+
+	def elevationSummary(self, hysteresis=0.0):
+		"""
+		Returns elevation Summary of track: lowest & highest
+		points, ascent & descent [m], grade of each segment.
+		hysteresis [m]: altitude variations smaller than
+		this threshold are ignored in ascent & descent
+		"""
+		return summary(self.column("alt"),
+			segmentDistances(self.column("lat"), self.column("lon")), hysteresis)
+
+	def grade(self):
+		"""
+		Returns grade [m/m] of each segment,
+		NaN where waypoints share the same position
+		"""
+		return grade(self.column("alt"), segmentDistances(self.column("lat"), self.column("lon")))
 
 	def totalDistance(self):
 		"""
-		Returns total distance covert in self
+		Returns total distance [m] covert in self
 		"""
-		dist = 0.0
-		for i in range(1, len(self.waypoints)):
-			dist += self.waypoints[i].distance(self.waypoints[i-1])
-		return dist
+		if (self._size < 2):
+			return 0.0
+		return float(self.accumulatedDistance()[-1])
 
 	def averageSpeed(self, indexes=None):
 		"""
 		Returns average speed [m/s] over whole track
-		or between specified portion
+		or between specified portion [index1, index2]
 
 		TODO: $RMC or other NMEA payload
 		provide instant. projected speed value,
 		should we use it?
 		"""
+		if (len(self) < 2):
+			return float("nan")
 		if (indexes is None):
-			index1 = 0
-			index2 = len(self.waypoints)
-		
-		speed = 0.0
-		for i in range(index1,index2):
-			d = self.waypoints[i].distance(self.waypoints[i-1])/1000
-			dt = self.waypoints[i].timeDiff(self.waypoints[i-1]).seconds
-			speed += d/dt 
+			indexes = [0, len(self)-1]
+		dt = self.spanDuration(*indexes)
+		if (dt == 0):
+			return float("nan")
+		return self.spanDistance(*indexes)/dt
+
+	def _span(self, index1, index2):
+		""" Resolves [index1, index2] span, in increasing order """
+		return sorted([self._index(index1), self._index(index2)])
+
+	def spanDistance(self, index1, index2):
+		"""
+		Returns distance [m] covert between
+		waypoints index1 & index2, in O(1)
+		"""
+		[i, j] = self._span(index1, index2)
+		acc = self.accumulatedDistance()
+		return float(acc[j]-acc[i])
+
+	def spanDuration(self, index1, index2):
+		"""
+		Returns time [s] elapsed between
+		waypoints index1 & index2
+		"""
+		[i, j] = self._span(index1, index2)
+		time = self.column("time")
+		return (int(time[j])-int(time[i]))/1000.0
+
+	def spanAscent(self, index1, index2):
+		"""
+		Returns cumulated ascent [m] between
+		waypoints index1 & index2, in O(1)
+		"""
+		[i, j] = self._span(index1, index2)
+		acc = self.accumulatedAscent()
+		return float(acc[j]-acc[i])
 
-		return speed/len(self.waypoints)
+	def spanDescent(self, index1, index2):
+		"""
+		Returns cumulated descent [m] between
+		waypoints index1 & index2, in O(1)
+		"""
+		[i, j] = self._span(index1, index2)
+		acc = self.accumulatedDescent()
+		return float(acc[j]-acc[i])
 
 	def instantSpeed(self, minDt=None, minDist=None):
 		"""
-		Returns instantaneous speed values
-		between all waypoints within track.
+		Returns instantaneous speed values [m/s]
+		between all waypoints within track,
+		NaN where two waypoints share the same date.
 
 		If minDt is specified: instant speed is averaged
 		between waypoints within specified time interval.
@@ -385,10 +637,8 @@ class GPSTrack:
 		speed = []
 		if ((minDt is None) and (minDist is None)):
 			# straight forward
-			for i in range(1, len(self.waypoints)):
-				d = self.waypoints[i].distance(self.waypoints[i-1])/1000	
-				dt = self.waypoints[i].timeDiff(self.waypoints[i-1]).seconds
-				speed.append(d/dt)
+			d = segmentDistances(self.column("lat"), self.column("lon"))
+			speed = segmentSpeeds(d, self.column("time"))
 		return speed
 
 	def highestPoint(self):
@@ -396,51 +646,170 @@ class GPSTrack:
 		Returns index of waypoint with
 		highest altitude
 		"""
-		index = 0
-		Max = -100
-		for i in range(0, len(self.waypoints)):
-			alt = float(self.waypoints[i].getAltitude())
-			if (alt > Max):
-				Max = alt
-				index = i
-		return index
+		return self._extremum("highestPoint", np.argmax, np.greater)
 
 	def lowestPoint(self):
 		"""
 		Returns index of waypoint with
 		lowest altitude
 		"""
-		index = 0
-		Min = 1000
-		for i in range(0, len(self.waypoints)):
-			alt = float(self.waypoints[i].getAltitude())
-			if (alt < Min):
-				Min = alt
+		return self._extremum("lowestPoint", np.argmin, np.less)
+
+	def _extremum(self, name, arg, better):
+		"""
+		Returns (first) index of altitude extremum,
+		only rows edited since last call are scanned
+		"""
+		if (self._size == 0):
+			return 0
+		[rows, index] = self._memoized(name)
+		if ((index is None) or (index >= rows)):
+			# extremum was edited, full scan
+			rows = 0
+		if (rows < self._size):
+			alt = self.column("alt")
+			i = rows + int(arg(alt[rows:]))
+			if ((rows == 0) or better(alt[i], alt[index])):
 				index = i
+			self._derived[name] = [self._size, index]
 		return index
-		
+
 	def accumulatedDistance(self):
 		"""
-		Returns accumulated distance
-		along the whole track
+		Returns accumulated distance [m]
+		along the whole track (read only)
+		"""
+		return self._accumulated("accumulatedDistance",
+			lambda start: segmentDistances(self.column("lat")[start:], self.column("lon")[start:]))
+
+	def accumulatedAscent(self):
+		"""
+		Returns accumulated ascent [m]
+		along the whole track (read only)
+		"""
+		return self._accumulated("accumulatedAscent",
+			lambda start: np.maximum(np.diff(self.column("alt")[start:].astype(np.float64)), 0.0))
+
+	def accumulatedDescent(self):
+		"""
+		Returns accumulated descent [m]
+		along the whole track (read only)
+		"""
+		return self._accumulated("accumulatedDescent",
+			lambda start: np.maximum(-np.diff(self.column("alt")[start:].astype(np.float64)), 0.0))
+
+	def _accumulated(self, name, segments):
+		"""
+		Returns memoized prefix sums (read only) of
+		segments(start), the increments between rows [start:].
+		Only rows edited since last call are summed.
+		Rows already returned are never rewritten:
+		editing them sums into a new buffer
+		"""
+		if (self._size == 0):
+			return np.zeros(0)
+		entry = self._memoized(name)
+		[rows, acc] = entry[:2]
+		if (rows < self._size):
+			exposed = entry[2] if (len(entry) > 2) else 0 # rows returned so far
+			if ((acc is None) or (len(acc) < self._size) or (rows < exposed)):
+				capacity = 0 if (acc is None) else len(acc)
+				if (capacity < self._size):
+					capacity = max(self._size, 2*capacity)
+				grown = np.empty(capacity)
+				if (rows > 0):
+					grown[:rows] = acc[:rows]
+				acc = grown
+			# resume from last valid row
+			start = max(rows-1, 0)
+			if (rows == 0):
+				acc[0] = 0.0
+			np.cumsum(segments(start), out=acc[start+1:self._size])
+			acc[start+1:self._size] += acc[start]
+			self._derived[name] = [self._size, acc, self._size]
+		view = acc[:self._size]
+		view.flags.writeable = False
+		return view
+
+	def spatialIndex(self):
+		"""
+		Returns grid index over coordinates,
+		built on demand & dropped on edits
+		"""
+		if (self._spatialIndex is None):
+			self._spatialIndex = SpatialIndex(self.column("lat"), self.column("lon"))
+		return self._spatialIndex
+
+	def search(self, waypoint, tolerance=1.0):
+		"""
+		Returns index of waypoint,
+		closest one within tolerance [m].
+		Returns -1 if not found
 		"""
-		x = []
-		acc = 0.0
-		x.append(0.0)
-		for i in range(1, len(self.waypoints)):
-			acc += self.waypoints[i].distance(self.waypoints[i-1])
-			x.append(acc)
-		return x
+		[lat, lon] = waypoint.toDecimalDegrees()
+		[idx, dist] = self.spatialIndex().nearest(lat, lon)
+		if ((len(idx) == 0) or (dist[0] > tolerance)):
+			return -1
+		return int(idx[0])
 
-	def search(self, waypoint):
+	def searchNearest(self, lat, lon, k=1):
 		"""
-		Returns index of waypoint
-		Returns -1 if not found
+		Returns indexes of the k waypoints
+		closest to given coordinates, closest first
+		"""
+		return self.spatialIndex().nearest(lat, lon, k)[0]
+
+	def searchRadius(self, lat, lon, radius):
+		"""
+		Returns indexes of waypoints within
+		radius [m] of given coordinates, closest first
+		"""
+		return self.spatialIndex().radius(lat, lon, radius)[0]
+
+	def searchBoundingBox(self, latMin, lonMin, latMax, lonMax):
+		"""
+		Returns indexes of waypoints within
+		given bounding box [decimal degrees]
+		"""
+		return self.spatialIndex().boundingBox(latMin, lonMin, latMax, lonMax)
+
+	def simplify(self, tolerance=None, count=None, method="douglasPeucker"):
 		"""
-		for i in range(0, len(self.waypoints)):
-			if (self.waypoints[i] == waypoint):
-				return i
-		return -1
+		Returns sorted indexes of waypoints to keep
+		so track shape stays within tolerance [m],
+		or to keep count waypoints.
+		method: 'douglasPeucker' or 'visvalingam'.
+		Results are cached until track is edited
+		"""
+		key = (method, tolerance, count)
+		if (key not in self._simplified):
+			if (method == "douglasPeucker"):
+				algorithm = douglasPeucker
+			elif (method == "visvalingam"):
+				algorithm = visvalingam
+			else:
+				raise ValueError("Unknown simplification method '{:s}'".format(method))
+			[x, y] = project(self.column("lat"), self.column("lon"))
+			self._simplified[key] = algorithm(x, y, tolerance, count)
+		return self._simplified[key]
+
+	def timeIndex(self):
+		"""
+		Returns [order, times]: order sorts track by date
+		(stable, None when track is already sorted) and
+		times are the sorted UTC epoch times [ms].
+		Built on demand, kept across edits when possible
+		"""
+		time = self.column("time")
+		if (self._timeOrder is False):
+			if (np.all(time[1:] >= time[:-1])):
+				self._timeOrder = None
+			else:
+				self._timeOrder = np.argsort(time, kind="stable")
+				self._sortedTimes = time[self._timeOrder]
+		if (self._timeOrder is None):
+			return [None, time]
+		return [self._timeOrder, self._sortedTimes]
 
 	def searchByDate(self, date):
 		"""
@@ -448,7 +817,117 @@ class GPSTrack:
 		at given date,
 		returns -1 if non existing
 		"""
-		for i in range(0, len(self.waypoints)):
-			if (self.waypoints[i].getDate() == date):
-				return i
-		return -1
+		[order, times] = self.timeIndex()
+		t = epochMs(date)
+		pos = int(np.searchsorted(times, t, side="left"))
+		if ((pos == len(times)) or (times[pos] != t)):
+			return -1
+		if (order is None):
+			return pos
+		return int(order[pos])
+
+	def nearest(self, date):
+		"""
+		Returns index of waypoint closest
+		in time to given date,
+		returns -1 if track is empty
+		"""
+		[order, times] = self.timeIndex()
+		if (len(times) == 0):
+			return -1
+		t = epochMs(date)
+		pos = int(np.searchsorted(times, t, side="left"))
+		if ((pos == len(times)) or ((pos > 0) and (t-times[pos-1] <= times[pos]-t))):
+			pos -= 1
+		if (order is None):
+			return pos
+		return int(order[pos])
+
+	def between(self, date0, date1):
+		"""
+		Returns indexes of waypoints stored
+		between given dates (included),
+		in chronological order
+		"""
+		[order, times] = self.timeIndex()
+		pos0 = int(np.searchsorted(times, epochMs(date0), side="left"))
+		pos1 = int(np.searchsorted(times, epochMs(date1), side="right"))
+		if (order is None):
+			return np.arange(pos0, max(pos0, pos1))
+		return order[pos0:pos1]
+
+def metersPerPixel(zoom, lat):
+	"""
+	Returns ground resolution [m/pixel] of
+	web mercator tiles at given zoom level & latitude
+	"""
+	return 2*np.pi*EARTH_RADIUS*np.cos(np.radians(lat))/(256*2**zoom)
+
+def polylineScript(key, lats, lons, color="#cc00cc", weight=4):
+	"""
+	Returns javascript (Leaflet) replacing polyline
+	stored under key on the map by given coordinates,
+	no polyline is drawn when coordinates are empty
+	"""
+	coords = "".join(formatChunks("[%.6f,%.6f],", [lats, lons]))
+	return (
+		'var gpsLayers = window.gpsLayers = window.gpsLayers || {{}};'
+		'if (gpsLayers["{0:s}"]) {{ map.removeLayer(gpsLayers["{0:s}"]); delete gpsLayers["{0:s}"]; }}'
+		'if ({1:d} > 0) {{ gpsLayers["{0:s}"] = L.polyline([{2:s}], {{color: "{3:s}", weight: {4:d}}}).addTo(map); }}'
+	).format(key, len(lats), coords[:-1], color, weight)
+
+def formatChunks(fmt, columns, chunkSize=1<<14):
+	"""
+	Formats rows of given columns with fmt ('%' style),
+	yields one string per chunk of chunkSize rows
+	"""
+	n = len(columns[0])
+	for i in range(0, n, chunkSize):
+		j = min(i+chunkSize, n)
+		values = np.stack([np.asarray(c[i:j], dtype=np.float64) for c in columns], axis=1)
+		yield (fmt*(j-i)) % tuple(values.ravel().tolist())
+
+@contextlib.contextmanager
+def exportStream(fp, member):
+	"""
+	Opens a buffered text stream for exporters:
+	fp is a path or a (text or binary) file object.
+	'.kmz' paths are zip archives holding member,
+	'.gz' paths are gzipped
+	"""
+	if (not(isinstance(fp, (str, os.PathLike)))):
+		if (isinstance(fp, io.TextIOBase)):
+			yield fp
+		else:
+			fd = io.TextIOWrapper(fp, encoding="utf-8")
+			try:
+				yield fd
+				fd.flush()
+			finally:
+				fd.detach() # leave caller's file opened
+		return
+
+	fp = os.fspath(fp)
+	if (fp.endswith(".kmz")):
+		with zipfile.ZipFile(fp, "w", zipfile.ZIP_DEFLATED) as zf:
+			with io.TextIOWrapper(zf.open(member, "w"), encoding="utf-8") as fd:
+				yield fd
+	elif (fp.endswith(".gz")):
+		with gzip.open(fp, "wt", encoding="utf-8") as fd:
+			yield fd
+	else:
+		with open(fp, "w", buffering=1<<20) as fd:
+			yield fd
+
+def exportName(fp):
+	""" Returns name of exported file """
+	if (isinstance(fp, (str, os.PathLike))):
+		return os.fspath(fp)
+	return str(getattr(fp, "name", "GPS Track"))
+
+def loadColumns(fp):
+	"""
+	Parses given file and returns its
+	columns, used by GPSTrack.fromFiles workers
+	"""
+	return GPSTrack(fp).columns()
@@ -0,0 +1,243 @@
+import os
+import gzip
+import zipfile
+import contextlib
+import datetime
+import numpy as np
+import xml.parsers.expat
+from Waypoint import *
+
+def coordinateColumns(text):
+	"""
+	Tokenizes KML 'lon,lat[,alt]' tuples
+	(whitespace separated) in bulk,
+	returns [lat, lon, alt] arrays
+	"""
+	tuples = text.split()
+	if (len(tuples) == 0):
+		return [np.zeros(0), np.zeros(0), np.zeros(0)]
+	fields = tuples[0].count(",") + 1
+	if ((fields in (2, 3)) and (text.count(",") == (fields-1)*len(tuples))):
+		values = np.array(text.replace(",", " ").split(), dtype=np.float64)
+		if (len(values) == fields*len(tuples)):
+			values = values.reshape(len(tuples), fields)
+			alt = values[:, 2] if (fields == 3) else np.zeros(len(tuples))
+			return [values[:, 1], values[:, 0], alt]
+
+	# mixed tuples: one at a time
+	rows = []
+	for t in tuples:
+		v = [float(x) for x in t.split(",") if (len(x) > 0)]
+		if (len(v) >= 2):
+			rows.append([v[1], v[0], v[2] if (len(v) > 2) else 0.0])
+	rows = np.array(rows, dtype=np.float64).reshape(-1, 3)
+	return [rows[:, 0], rows[:, 1], rows[:, 2]]
+
+def whenToEpochMs(text):
+	"""
+	Converts a KML <when> (ISO 8601) value
+	into UTC epoch [ms], None if not supported
+	"""
+	text = text.strip()
+	if (text.endswith("Z")):
+		text = text[:-1] + "+00:00"
+	try:
+		return epochMs(datetime.datetime.fromisoformat(text))
+	except ValueError:
+		return None
+
+class KMLDecoder:
+	"""
+	Incremental KML decoder: data is fed by chunks and
+	decoded fixes are available as soon as they are parsed.
+	Reads <coordinates> of LineStrings (any number of Placemarks,
+	MultiGeometry..) and gx:Track (<when> & <gx:coord>).
+	No tree is built: text is tokenized in bulk by chunks
+	of chunkSize characters, memory does not depend on file size
+	"""
+
+	# containers whose coordinates are not part of a track
+	IGNORED = ("Point", "Polygon")
+
+	def __init__(self, date=None, chunkSize=1<<20):
+		"""
+		date: UTC epoch [ms] given to coordinates
+		that carry no timestamp (today by default)
+		"""
+		self.date = today() if (date is None) else date
+		self.chunkSize = chunkSize
+		self.parser = xml.parsers.expat.ParserCreate(namespace_separator=" ")
+		self.parser.buffer_text = True
+		self.parser.StartElementHandler = self.start
+		self.parser.EndElementHandler = self.end
+		self.parser.CharacterDataHandler = self.data
+		self.field = None # element whose text is collected
+		self.text = []
+		self.size = 0
+		self.ignored = 0 # depth within ignored containers
+		self.track = None # times & coordinates of current gx:Track
+		self.fixes = [] # decoded Fix of arrays, not consumed yet
+
+	@staticmethod
+	def localName(name):
+		""" Drops namespace URI of element name """
+		return name.rsplit(" ", 1)[-1]
+
+	def feed(self, data, final=False):
+		"""
+		Feeds a chunk of KML data (bytes or str),
+		returns Fix of arrays decoded so far (None if empty)
+		"""
+		self.parser.Parse(data, final)
+		return self.pop()
+
+	def pop(self):
+		""" Returns decoded fixes not consumed yet """
+		if (len(self.fixes) == 0):
+			return None
+		fixes = self.fixes
+		self.fixes = []
+		if (len(fixes) == 1):
+			return fixes[0]
+		return Fix(*[np.concatenate([getattr(f, name) for f in fixes]) for (name, _) in COLUMNS])
+
+	def start(self, name, attributes):
+		name = self.localName(name)
+		if (name in self.IGNORED):
+			self.ignored += 1
+		elif (name == "Track"):
+			self.track = [[], [], [], []] # times, coordinates: arrays, pending
+		elif ((self.ignored == 0) and ((name == "coordinates") or ((self.track is not None) and (name in ("when", "coord"))))):
+			self.field = name
+			self.text = []
+			self.size = 0
+
+	def data(self, text):
+		if (self.field is None):
+			return
+		self.text.append(text)
+		self.size += len(text)
+		if (self.size >= self.chunkSize):
+			self.flush(final=False)
+
+	def flush(self, final):
+		"""
+		Tokenizes collected text: only up to
+		last whitespace unless final is set
+		"""
+		text = "".join(self.text)
+		if (not(final)):
+			cut = max(text.rfind(" "), text.rfind("\n"), text.rfind("\t"), text.rfind("\r"))
+			if ((cut < 0) or (self.field == "when")):
+				self.text = [text] # nothing to cut yet
+				return
+			[text, rest] = [text[:cut], text[cut:]]
+			self.text = [rest]
+			self.size = len(rest)
+
+		if (self.field == "coordinates"):
+			[lat, lon, alt] = coordinateColumns(text)
+			self.append(lat, lon, alt, np.full(len(lat), self.date, dtype=np.int64))
+		elif (self.field == "coord"):
+			self.track[3].append(text)
+			if (len(self.track[3]) >= 1<<16):
+				self.compactTrack()
+
+	def end(self, name):
+		name = self.localName(name)
+		if (name in self.IGNORED):
+			self.ignored -= 1
+		elif ((self.field is not None) and (name == self.field)):
+			if (self.field == "when"):
+				self.track[1].append(whenToEpochMs("".join(self.text)))
+				if (len(self.track[1]) >= 1<<16):
+					self.compactTrack()
+			else:
+				self.flush(final=True)
+			self.field = None
+			self.text = []
+		elif ((name == "Track") and (self.track is not None)):
+			self.endTrack()
+
+	def compactTrack(self):
+		"""
+		Tokenizes pending <when> & <gx:coord>
+		values of current gx:Track in bulk
+		"""
+		[times, pendingTimes, coords, pendingCoords] = self.track
+		if (len(pendingTimes) > 0):
+			times.append(np.array([-1 if (t is None) else t for t in pendingTimes], dtype=np.int64))
+			self.track[1] = []
+		if (len(pendingCoords) > 0):
+			values = np.array(" ".join(pendingCoords).split(), dtype=np.float64)
+			coords.append(values[:len(values) - len(values)%3].reshape(-1, 3))
+			self.track[3] = []
+
+	def endTrack(self):
+		"""
+		Pairs <when> & <gx:coord> of completed gx:Track
+		"""
+		self.compactTrack()
+		[times, _, coords, _] = self.track
+		self.track = None
+		values = np.concatenate(coords) if (len(coords) > 0) else np.zeros((0, 3))
+		times = np.concatenate(times) if (len(times) > 0) else np.full(len(values), self.date, dtype=np.int64)
+		n = min(len(times), len(values))
+		[times, values] = [times[:n], values[:n]]
+		valid = times >= 0 # unsupported dates are dropped
+		values = values[valid]
+		self.append(values[:, 1], values[:, 0], values[:, 2], times[valid])
+
+	def append(self, lat, lon, alt, time):
+		if (len(lat) == 0):
+			return
+		self.fixes.append(Fix(
+			np.asarray(lat, dtype=np.float64),
+			np.asarray(lon, dtype=np.float64),
+			np.asarray(alt, dtype=np.float32),
+			np.asarray(time, dtype=np.int64),
+			np.full(len(lat), np.nan, dtype=np.float32)
+		))
+
+@contextlib.contextmanager
+def openKML(path):
+	"""
+	Opens a KML file for binary reading,
+	'.kmz' archives (first .kml member) and
+	'.gz' files are decompressed on the fly
+	"""
+	path = os.fspath(path)
+	if (path.endswith(".kmz")):
+		with zipfile.ZipFile(path) as archive:
+			names = [n for n in archive.namelist() if n.endswith(".kml")]
+			if (len(names) == 0):
+				raise ValueError("No KML document in '{:s}'".format(path))
+			with archive.open(names[0]) as fd:
+				yield fd
+	elif (path.endswith(".gz")):
+		with gzip.open(path, "rb") as fd:
+			yield fd
+	else:
+		with open(path, "rb") as fd:
+			yield fd
+
+def iterKML(source, readSize=1<<20, date=None):
+	"""
+	Streams fixes parsed from a KML document, given as
+	a path (.kml, .kmz, .kml.gz) or an (opened) file object,
+	read by chunks of readSize bytes. Yields a Fix of column arrays
+	per chunk (see KMLDecoder). Memory usage does not depend on file size
+	"""
+	if (isinstance(source, (str, os.PathLike))):
+		with openKML(source) as fd:
+			yield from iterKML(fd, readSize, date)
+		return
+
+	decoder = KMLDecoder(date)
+	while (True):
+		chunk = source.read(readSize)
+		fix = decoder.feed(chunk, final=(len(chunk) == 0))
+		if (fix is not None):
+			yield fix
+		if (len(chunk) == 0):
+			break
@@ -0,0 +1,107 @@
+import os
+import numpy as np
+from Waypoint import *
+from NMEA import validChecksums
+
+# one LOCUS (basic content) record, 16 bytes little endian
+RECORD = np.dtype([
+	("time", "<u4"), # UTC epoch [s]
+	("fix", "u1"), # fix type, valid in ]0:5[
+	("lat", "<f4"), # decimal degrees
+	("lon", "<f4"), # decimal degrees
+	("alt", "<i2"), # [m]
+	("checksum", "u1"), # xor of the 15 previous bytes
+])
+
+def decodeRecords(data):
+	"""
+	Decodes raw LOCUS bytes into a Fix of columns.
+	Records without GPS fix or with a faulty
+	checksum are discarded
+	"""
+	n = len(data)//RECORD.itemsize
+	raw = np.frombuffer(data, dtype=np.uint8, count=n*RECORD.itemsize).reshape(n, RECORD.itemsize)
+	records = raw.view(RECORD).reshape(n)
+	valid = (records["fix"] > 0) & (records["fix"] < 5)
+	valid &= np.bitwise_xor.reduce(raw[:, :-1], axis=1) == records["checksum"]
+	records = records[valid]
+	return Fix(
+		records["lat"].astype(np.float64),
+		records["lon"].astype(np.float64),
+		records["alt"].astype(np.float32),
+		records["time"].astype(np.int64)*1000,
+		np.full(len(records), np.nan, dtype=np.float32)
+	)
+
+def decodeLOCUS(source):
+	"""
+	Decodes a LOCUS flash dump given as a path,
+	a file object or an iterable of lines,
+	returns a Fix of columns
+	"""
+	if (isinstance(source, (str, os.PathLike))):
+		fd = open(source, "r")
+	else:
+		fd = source
+
+	try:
+		lines = []
+		for line in fd:
+			if (isinstance(line, bytes)):
+				line = line.decode("ascii", "replace")
+			if (line.startswith("$PMTKLOX,1,")):
+				lines.append(line.strip())
+	finally:
+		if (fd is not source):
+			fd.close()
+
+	return decodeRecords(locusPayload(lines))
+
+def locusPayload(lines):
+	"""
+	Returns raw bytes held by given $PMTKLOX,1 data lines,
+	lines with faulty checksum are discarded
+	"""
+	if (len(lines) == 0):
+		return b""
+	
+	# validate all checksums at once
+	data = np.frombuffer("\n".join(lines).encode("ascii", "replace"), dtype=np.uint8)
+	lengths = np.fromiter(map(len, lines), dtype=np.int64, count=len(lines))
+	starts = np.zeros(len(lines), dtype=np.int64)
+	np.cumsum(lengths[:-1]+1, out=starts[1:])
+	ends = starts + lengths
+	stars = np.where((lengths >= 3) & (data[np.maximum(ends-3, 0)] == ord("*")), ends-3, -1)
+	valid = validChecksums(data, starts, stars)
+
+	# payload: after '$PMTKLOX,1,' header & line number (up to 12 digits), up to '*'
+	window = data[np.minimum(starts[:, None] + np.arange(11, 24), len(data)-1)]
+	comma = window == ord(",")
+	begin = starts + 12 + np.argmax(comma, axis=1)
+	valid &= np.any(comma, axis=1) & (begin <= stars)
+
+	# blank headers, checksums & faulty lines, then decode
+	# all payloads at once (bytes.fromhex skips whitespace)
+	blanks = np.concatenate([
+		np.stack([starts[valid], begin[valid]], axis=1), # header
+		np.stack([stars[valid], ends[valid]], axis=1), # checksum
+		np.stack([starts[~valid], ends[~valid]], axis=1),
+	])
+	sizes = blanks[:, 1] - blanks[:, 0]
+	offsets = np.cumsum(sizes) - sizes
+	payload = data.copy()
+	payload[np.arange(sizes.sum()) + np.repeat(blanks[:, 0] - offsets, sizes)] = ord(" ")
+	try:
+		return bytes.fromhex(payload.tobytes().replace(b",", b" ").decode("ascii"))
+	except ValueError: # corrupted line passing checksum
+		pass
+
+	chunks = []
+	for i in np.flatnonzero(valid):
+		line = lines[i]
+		content = line[:line.rfind("*")].split(",", 3) # remove header, type & line number
+		try:
+			chunks.append(bytes.fromhex(content[3].replace(",", "")))
+		except (ValueError, IndexError):
+			pass
+	return b"".join(chunks)
@@ -0,0 +1,375 @@
+import os
+import mmap
+import itertools
+import collections
+import numpy as np
+from Waypoint import *
+
+# value of each (uppercase) hex digit by ascii code, 0xFF otherwise
+HEXDIGITS = np.full(256, 0xFF, dtype=np.uint8)
+HEXDIGITS[np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)] = np.arange(16)
+
+# decoded $GPGGA or $GPRMC sentence:
+# kind: "GGA" or "RMC", tod: UTC time of day [ms],
+# day: UTC epoch [ms] of day start (RMC only, None for GGA),
+# lat, lon, alt, speed: see Fix (alt None for RMC, speed NaN for GGA)
+Sentence = collections.namedtuple("Sentence", ["kind","tod","day","lat","lon","alt","speed"])
+
+def xorSpans(data, starts, ends):
+	"""
+	Returns XOR of all bytes within data[starts[i]:ends[i]],
+	for all spans at once. data: uint8 array
+	"""
+	starts = np.asarray(starts, dtype=np.int64)
+	ends = np.asarray(ends, dtype=np.int64)
+	if (len(starts) == 0):
+		return np.zeros(0, dtype=np.uint8)
+	data = np.append(data, np.uint8(0)) # reduceat indexes must be in range
+	indexes = np.empty(2*len(starts), dtype=np.int64)
+	indexes[0::2] = starts
+	indexes[1::2] = ends
+	xor = np.bitwise_xor.reduceat(data, indexes)[0::2]
+	xor[starts >= ends] = 0 # empty spans
+	return xor
+
+def validChecksums(data, starts, stars):
+	"""
+	Validates checksums of sentences held in data (uint8 array),
+	sentence i runs from '$' at starts[i] to '*' at stars[i],
+	followed by 2 hex digits. Returns a boolean mask
+	"""
+	starts = np.asarray(starts, dtype=np.int64)
+	stars = np.asarray(stars, dtype=np.int64)
+	valid = (stars > starts) & (stars+2 < len(data))
+	stars = np.where(valid, stars, starts)
+	high = HEXDIGITS[data[np.minimum(stars+1, len(data)-1)]]
+	low = HEXDIGITS[data[np.minimum(stars+2, len(data)-1)]]
+	valid &= (high != 0xFF) & (low != 0xFF)
+	expected = (high << 4) | low
+	return valid & (xorSpans(data, starts+1, stars) == expected)
+
+def parseSentence(line):
+	"""
+	Parses a $GPGGA or $GPRMC sentence into a Fix
+	(on its own: see EpochFuser to merge sentences of an epoch).
+	Returns None for other sentences,
+	faulty checksums or sentences without GPS fix
+	"""
+	return sentenceToFix(parseFields(line))
+
+def parseFields(line):
+	"""
+	Parses a $GPGGA or $GPRMC sentence into a Sentence.
+	Returns None for other sentences,
+	faulty checksums or sentences without GPS fix
+	"""
+	line = line.strip()
+	if (not(line.startswith("$GPGGA") or line.startswith("$GPRMC"))):
+		return None
+	checksum = line.split("*")[-1]
+	if (checksum != Waypoint.checksum(line)):
+		return None
+	return decodeFields(line)
+
+def decodeSentence(line):
+	"""
+	Decodes a $GPGGA or $GPRMC sentence
+	whose checksum has already been validated into a Fix.
+	Returns None for sentences without GPS fix
+	"""
+	return sentenceToFix(decodeFields(line))
+
+def decodeFields(line):
+	"""
+	Decodes a $GPGGA or $GPRMC sentence
+	whose checksum has already been validated into a Sentence.
+	Returns None for sentences without GPS fix
+	"""
+	content = line.split(",")
+	try:
+		if (content[0] == "$GPGGA"):
+			if (content[6] == "0"): # no fix
+				return None
+			tod = timeOfDay(content[1]) # hhmmss.ss
+			lat = Waypoint.DDMMSSSStoDecimalDegrees(content[2], content[3])
+			lon = Waypoint.DDMMSSSStoDecimalDegrees(content[4], content[5])
+			return Sentence("GGA", tod, None, lat, lon, float(content[9]), float("nan"))
+
+		else:
+			if (content[2] != 'A'): # 'A':valid (GPS fix), 'V' non valid
+				return None
+			tod = timeOfDay(content[1]) # hhmmss.ss
+			day = dayStart(content[9]) # ddmmyy
+			lat = Waypoint.DDMMSSSStoDecimalDegrees(content[3], content[4])
+			lon = Waypoint.DDMMSSSStoDecimalDegrees(content[5], content[6])
+			speed = Waypoint.knotsToKmph(float(content[7]))
+			return Sentence("RMC", tod, day, lat, lon, None, speed)
+
+	except (ValueError, IndexError): # truncated or empty fields
+		return None
+
+def sentenceToFix(sentence):
+	"""
+	Converts a single Sentence into a Fix,
+	GGA sentences carry no day: today is used
+	"""
+	if (sentence is None):
+		return None
+	if (sentence.kind == "GGA"):
+		return Fix(sentence.lat, sentence.lon, sentence.alt, today()+sentence.tod, sentence.speed)
+	return Fix(sentence.lat, sentence.lon, 0.0, sentence.day+sentence.tod, sentence.speed)
+
+class EpochFuser:
+	"""
+	Fuses $GPGGA & $GPRMC sentences of a same epoch
+	(UTC time of day) into a single Fix: altitude from GGA,
+	date & speed from RMC. Epochs without RMC are dated
+	from the last RMC, midnight rollovers included.
+	Epochs without GGA keep the last GGA altitude.
+	Sentences are pushed in order, fixes are returned
+	once their epoch is complete
+	"""
+
+	def __init__(self, maxUndated=256, maxHeld=4):
+		"""
+		maxUndated: epochs waiting for a first RMC to be dated,
+		today is used beyond that (GGA only logs)
+		maxHeld: fixes waiting for a first GGA altitude,
+		0 m is used beyond that (RMC only logs)
+		"""
+		self.epoch = None # [tod, day, lat, lon, alt, speed, kinds]
+		self.kinds = None # sentence kinds seen in previous epochs
+		self.last = None # time of day of previous epoch
+		self.day = None # day start [ms] of last dated epoch
+		self.tod = None # time of day of last dated epoch
+		self.undated = [] # [tod, lat, lon, alt, speed] waiting for a date
+		self.maxUndated = maxUndated
+		self.alt = None # last GGA altitude
+		self.held = [] # fixes waiting for a first altitude
+		self.maxHeld = maxHeld
+
+	def push(self, sentence):
+		"""
+		Pushes a Sentence,
+		returns list of completed fixes
+		"""
+		fixes = []
+		if ((self.epoch is not None) and (self.epoch[0] != sentence.tod)):
+			fixes += self.complete()
+		if (self.epoch is None):
+			if (sentence.tod == self.last):
+				return self.release(fixes) # epoch already completed
+			self.epoch = [sentence.tod, None, sentence.lat, sentence.lon, None, float("nan"), set()]
+
+		epoch = self.epoch
+		if (sentence.kind == "GGA"):
+			epoch[2:5] = [sentence.lat, sentence.lon, sentence.alt]
+			self.alt = sentence.alt
+		else:
+			epoch[1] = sentence.day
+			epoch[5] = sentence.speed
+			if ("GGA" not in epoch[6]):
+				epoch[2:4] = [sentence.lat, sentence.lon]
+		epoch[6].add(sentence.kind)
+
+		if ((self.kinds is not None) and (epoch[6] >= self.kinds)):
+			# all sentences received: complete
+			fixes += self.complete()
+		return self.release(fixes)
+
+	def complete(self):
+		"""
+		Completes current epoch,
+		returns list of fixes dated so far
+		"""
+		[tod, day, lat, lon, alt, speed, kinds] = self.epoch
+		self.epoch = None
+		self.kinds = kinds if (self.kinds is None) else (self.kinds | kinds)
+		self.last = tod
+		if (alt is None): # GGA lost: keep last altitude
+			alt = self.alt
+		if ((day is None) and (self.day is not None)):
+			day = self.day
+			if (tod < self.tod - DAY//2): # midnight rollover
+				day += DAY
+		if (day is None):
+			self.undated.append([tod, lat, lon, alt, speed])
+			if (len(self.undated) > self.maxUndated):
+				return self.dateForward(today())
+			return []
+
+		fixes = self.dateBackward(day, tod)
+		self.day = day
+		self.tod = tod
+		fixes.append(Fix(lat, lon, alt, day+tod, speed))
+		return fixes
+
+	def dateBackward(self, day, tod):
+		"""
+		Dates undated epochs, preceding
+		an epoch of given day & time of day
+		"""
+		fixes = []
+		for [t, lat, lon, alt, speed] in reversed(self.undated):
+			if (t > tod + DAY//2): # previous day
+				day -= DAY
+			tod = t
+			fixes.append(Fix(lat, lon, alt, day+t, speed))
+		self.undated = []
+		return fixes[::-1]
+
+	def dateForward(self, day):
+		"""
+		Dates undated epochs,
+		first one being on given day
+		"""
+		fixes = []
+		tod = self.undated[0][0]
+		for [t, lat, lon, alt, speed] in self.undated:
+			if (t < tod - DAY//2): # next day
+				day += DAY
+			tod = t
+			fixes.append(Fix(lat, lon, alt, day+t, speed))
+		self.undated = []
+		[self.day, self.tod] = [day, tod]
+		return fixes
+
+	def flush(self):
+		"""
+		Completes pending epoch at end of stream,
+		returns list of remaining fixes
+		"""
+		fixes = []
+		if (self.epoch is not None):
+			fixes += self.complete()
+		if (len(self.undated) > 0):
+			fixes += self.dateForward(today())
+		return self.release(fixes, final=True)
+
+	def release(self, fixes, final=False):
+		"""
+		Returns fixes ready to be delivered: fixes completed
+		before any GGA altitude is known are held back,
+		then given the first altitude (0 m for RMC only logs)
+		"""
+		self.held += fixes
+		if ((self.alt is None) and not(final) and (self.maxHeld > 0)):
+			if (any(fix.alt is None for fix in self.held)):
+				if (len(self.held) <= self.maxHeld):
+					return []
+				self.maxHeld = 0 # no GGA output: stop holding
+		alt = 0.0 if (self.alt is None) else self.alt
+		fixes = [fix if (fix.alt is not None) else fix._replace(alt=alt) for fix in self.held]
+		self.held = []
+		return fixes
+
+def iterNMEA(source, batchSize=None):
+	"""
+	Streams fixes parsed from an NMEA log,
+	given as a path or an (opened) file object.
+	GGA & RMC sentences of an epoch are fused (see EpochFuser).
+	Yields one Fix at a time, or Fix of column arrays
+	holding up to batchSize fixes if batchSize is given.
+	Memory usage does not depend on log size
+	"""
+	if (isinstance(source, (str, os.PathLike))):
+		fd = open(source, "r")
+	else:
+		fd = source
+
+	try:
+		fuser = EpochFuser()
+		batch = []
+		for line in itertools.chain(fd, [None]):
+			if (line is None): # end of log
+				batch += fuser.flush()
+			else:
+				if (isinstance(line, bytes)):
+					line = line.decode("ascii", "replace")
+				sentence = parseFields(line)
+				if (sentence is None):
+					continue
+				batch += fuser.push(sentence)
+
+			if (batchSize is None):
+				yield from batch
+				batch = []
+			else:
+				while ((len(batch) >= batchSize) or ((line is None) and (len(batch) > 0))):
+					yield stackFixes(batch[:batchSize])
+					batch = batch[batchSize:]
+
+	finally:
+		if (fd is not source):
+			fd.close()
+
+def mapNMEA(path, windowSize=1<<24):
+	"""
+	Streams fixes parsed from an NMEA log file,
+	which is memory mapped and scanned by windows of windowSize bytes.
+	Sentence boundaries, $GPGGA/$GPRMC prefixes and checksums
+	are all resolved on raw bytes at once, only valid sentences
+	are decoded, GGA & RMC sentences of an epoch are fused
+	(see EpochFuser). Yields a Fix of column arrays per window
+	"""
+	with open(path, "rb") as fd:
+		size = os.fstat(fd.fileno()).st_size
+		if (size == 0):
+			return
+		with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+			fuser = EpochFuser()
+			offset = 0
+			while (offset < size):
+				last = (offset+windowSize >= size)
+				[spans, length] = scanSentences(mm, offset, min(windowSize, size-offset), last)
+				fixes = []
+				for (start, end) in spans.tolist():
+					sentence = decodeFields(mm[offset+start:offset+end].decode("ascii", "replace"))
+					if (sentence is not None):
+						fixes += fuser.push(sentence)
+				offset += length
+				if (last):
+					fixes += fuser.flush()
+				if (len(fixes) > 0):
+					yield stackFixes(fixes)
+
+def scanSentences(buffer, offset, count, last):
+	"""
+	Locates valid $GPGGA/$GPRMC sentences within
+	count bytes of buffer starting at offset.
+	Only complete lines are considered, unless last is set.
+	Returns [spans, length]: (start, end) of valid sentences,
+	relative to offset, and number of bytes consumed
+	"""
+	data = np.frombuffer(buffer, dtype=np.uint8, count=count, offset=offset)
+	try:
+		ends = np.flatnonzero(data == 0x0A) # '\n'
+		length = count
+		if (not(last)):
+			if (len(ends) == 0): # no complete line in window: skip it
+				return [np.zeros((0, 2), dtype=np.int64), count]
+			length = int(ends[-1])+1
+		elif ((len(ends) == 0) or (ends[-1] != count-1)):
+			ends = np.append(ends, count)
+
+		starts = np.zeros(len(ends), dtype=np.int64)
+		starts[1:] = ends[:-1]+1
+		# drop '\r' of '\r\n' line endings
+		cr = (ends > starts) & (data[np.maximum(ends-1, 0)] == 0x0D)
+		ends = ends - cr
+
+		# $GPGGA & $GPRMC prefixes, checksum '*HH' at end of line
+		keep = (ends-starts) > 9
+		starts = starts[keep]
+		ends = ends[keep]
+		prefix = data[starts[:, None] + np.arange(6)]
+		keep = (prefix == np.frombuffer(b"$GPGGA", dtype=np.uint8)).all(axis=1)
+		keep |= (prefix == np.frombuffer(b"$GPRMC", dtype=np.uint8)).all(axis=1)
+		keep &= data[ends-3] == 0x2A # '*'
+		starts = starts[keep]
+		ends = ends[keep]
+		keep = validChecksums(data, starts, ends-3)
+		return [np.stack((starts[keep], ends[keep]), axis=1), length]
+
+	finally:
+		del data # release buffer, mmap cannot be closed otherwise
@@ -0,0 +1,130 @@
+import os
+import asyncio
+import collections
+from NMEA import *
+
+class NMEAStream:
+	"""
+	Asynchronous iterator over fixes received on a
+	serial port (or any file descriptor), within an asyncio event loop.
+	Reads are non blocking, partial lines are buffered and
+	sentences with a faulty checksum are discarded.
+	GGA & RMC sentences of an epoch are fused into one fix,
+	delivered as soon as the epoch is complete.
+	Backpressure: reading stops while maxsize fixes are
+	waiting to be consumed, data then waits in OS buffers
+	"""
+
+	def __init__(self, port, maxsize=256, loop=None):
+		"""
+		port: serial port (pyserial) or file descriptor
+		maxsize: maximal number of fixes waiting to be consumed
+		"""
+		if (hasattr(port, "fileno")):
+			port = port.fileno()
+		self.fd = port
+		self.maxsize = maxsize
+		self.loop = loop
+		self.buffer = bytearray()
+		self.fixes = collections.deque()
+		self.fuser = EpochFuser() # one fix per epoch
+		self.waiter = None
+		self.started = False
+		self.reading = False
+		self.eof = False
+		self.sentences = 0 # received
+		self.discarded = 0 # unsupported, faulty or without fix
+
+	def start(self):
+		"""
+		Starts watching port,
+		called on first iteration
+		"""
+		if (self.loop is None):
+			self.loop = asyncio.get_running_loop()
+		self.started = True
+		os.set_blocking(self.fd, False)
+		self.resume()
+
+	def pause(self):
+		if (self.reading):
+			self.loop.remove_reader(self.fd)
+			self.reading = False
+
+	def resume(self):
+		if (not(self.reading) and not(self.eof)):
+			self.loop.add_reader(self.fd, self.onReadable)
+			self.reading = True
+
+	def close(self):
+		"""
+		Stops watching port, pending
+		fixes can still be consumed
+		"""
+		if (self.loop is not None):
+			self.pause()
+		if (not(self.eof)):
+			self.fixes.extend(self.fuser.flush())
+		self.eof = True
+		self.wakeup()
+
+	def wakeup(self):
+		if ((self.waiter is not None) and not(self.waiter.done())):
+			self.waiter.set_result(None)
+
+	def onReadable(self):
+		"""
+		Called by event loop when port has data
+		"""
+		try:
+			data = os.read(self.fd, 1<<16)
+		except BlockingIOError:
+			return
+		except OSError: # port closed (EIO on pty)
+			data = b""
+		if (len(data) == 0):
+			self.close()
+			return
+
+		self.buffer += data
+		end = self.buffer.rfind(b"\n")
+		if (end < 0):
+			return
+		lines = self.buffer[:end].split(b"\n")
+		del self.buffer[:end+1]
+		for line in lines:
+			self.sentences += 1
+			sentence = parseFields(line.decode("ascii", "replace"))
+			if (sentence is None):
+				self.discarded += 1
+			else:
+				self.fixes.extend(self.fuser.push(sentence))
+
+		if (len(self.fixes) >= self.maxsize):
+			self.pause()
+		if (len(self.fixes) > 0):
+			self.wakeup()
+
+	def __aiter__(self):
+		return self
+
+	async def __anext__(self):
+		if (not(self.started)):
+			self.start()
+		while (len(self.fixes) == 0):
+			if (self.eof):
+				raise StopAsyncIteration
+			self.waiter = self.loop.create_future()
+			await self.waiter
+			self.waiter = None
+
+		fix = self.fixes.popleft()
+		if (len(self.fixes) <= self.maxsize//2):
+			self.resume()
+		return fix
+
+	async def __aenter__(self):
+		return self
+
+	async def __aexit__(self, *exc):
+		self.close()
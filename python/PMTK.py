@@ -1,5 +1,9 @@
 import time
+import select
 import serial
+import collections
+from NMEAStream import *
+from GPSTrack import *
 
 # PMTK module
 PMTK_SET_NMEA_UPDATE_100_MILLIHERTZ = "$PMTK220,10000*2F\r\n"
@@ -44,10 +48,23 @@ PMTK_Q_RELEASE = "$PMTK605*31\r\n"
 PGCMD_ANTENNA = "$PGCMD,33,1*6C\r\n"
 PGCMD_NOANTENNA = "$PGCMD,33,0*6D\r\n"
 
+# data sentence answering query commands, by command ID
+# (other commands are answered by $PMTK001,<cmd>,<flag> acknowledgements)
+PMTK_REPLIES = {
+	"183": "$PMTKLOG", # PMTK_STATUS_QUERY
+	"400": "$PMTK500", # PMTK_API_Q_FIX_CTRL
+	"605": "$PMTK705", # PMTK_Q_RELEASE
+}
+
+# commands the module never answers: link switched right away
+PMTK_NO_ANSWER = ["251"] # PMTK_SET_BAUD_*
+
 class PMTK:
 
 	def __init__(self, dev):
 		self.serial = self.openSerial(dev, 9600)
+		self.rx = bytearray() # received, not yet complete line
+		self.unsolicited = collections.deque(maxlen=1024) # lines no command waited for
 
 	def status(self):
 		"""
@@ -104,27 +121,99 @@ class PMTK:
 			print("Error: {:s}".format(answer))
 			
 	def stopLogger(self):
-		print("answer: {:s}".format(self.serial.sendCommand(PMTK_STOP_LOG)))
+		print("answer: {:s}".format(self.sendCommand(PMTK_STOP_LOG)))
 	
-	def dumpFlash(self, fp):
+	def dumpFlash(self, fp=None, baudrate=57600, progress=None, timeout=2.0):
 		"""
-		Dumps internal flash content
-		into desired file
+		Dumps internal flash content, link is switched
+		to given baudrate for the transfer (then back to 9600).
+		Records are decoded into a GPS track while they arrive,
+		raw locus lines are also written into fp if given.
+		progress(lines, total) is called as lines arrive.
+		Dump ends on $PMTKLOX,2 trailer or after timeout [s] of silence.
+		Returns GPS track
 		"""
-		print("Turning NMEA off..\n")
 		self.sendCommand(PMTK_SET_NMEA_OUTPUT_OFF)
-		print("Dumping flash content..\n")
-		self.sendCommand(PMTK_DUMP_FLASH)
+		if (baudrate != self.serial.baudrate):
+			self.setBaudrate(baudrate)
 
-		fd = open(fp, "w")
-		while (True):
-			try:
-				locus = self.serial.readline().decode("utf-8")
-				print(locus)
-				fd.write(locus+"\n")
-			except SerialTimeout:
-				break
-		fd.close()
+		fd = None
+		if (fp is not None):
+			fd = open(fp, "w")
+
+		track = GPSTrack()
+		[lines, total, pending] = [0, 0, b""]
+		try:
+			self.serial.write(PMTK_DUMP_FLASH.encode("ascii"))
+			deadline = time.monotonic() + timeout
+			done = False
+			while (not(done)):
+				if (self.rx.find(b"\n") < 0):
+					if (time.monotonic() > deadline):
+						break
+					self.fill(max(0.0, deadline - time.monotonic()))
+					if (self.rx.find(b"\n") >= 0):
+						deadline = time.monotonic() + timeout
+					continue
+
+				# consume all complete lines at once
+				end = self.rx.rfind(b"\n")
+				chunk = self.rx[:end].decode("ascii", "replace").split("\n")
+				del self.rx[:end+1]
+				records = []
+				for line in chunk:
+					line = line.strip()
+					# drop line noise before sentence, checksum still applies
+					line = line[max(line.rfind("$PMTKLOX"), 0):]
+					if (line.startswith("$PMTKLOX,1,")):
+						records.append(line)
+					elif (line.startswith("$PMTKLOX,0,")):
+						# header: only used for progress, faulty ones are ignored
+						if ((line[-3:-2] == "*") and (line[-2:].upper() == Waypoint.checksum(line))):
+							try:
+								total = int(line.split(",")[2].split("*")[0])
+							except (ValueError, IndexError):
+								pass
+					elif (line.startswith("$PMTKLOX,2")):
+						done = True
+					else:
+						self.unsolicited.append(line)
+				if (fd is not None):
+					fd.write("\n".join(chunk) + "\n")
+
+				# records may straddle lines
+				data = pending + locusPayload(records)
+				n = len(data) - len(data)%RECORD.itemsize
+				track.extend(decodeRecords(data[:n]))
+				pending = data[n:]
+				lines += len(records)
+				if (progress is not None):
+					progress(lines, total)
+		finally:
+			if (fd is not None):
+				fd.close()
+			if (baudrate != 9600):
+				self.setBaudrate(9600)
+		return track
+
+	def setBaudrate(self, baudrate):
+		"""
+		Switches GPS module & serial link
+		to given baud rate (9600 or 57600)
+		"""
+		if (baudrate == 57600):
+			cmd = PMTK_SET_BAUD_57600
+		elif (baudrate == 9600):
+			cmd = PMTK_SET_BAUD_9600
+		else:
+			raise ValueError("Baud rate {:d} is not supported".format(baudrate))
+		# module switches right away, no acknowledgement
+		self.serial.write(cmd.encode("ascii"))
+		self.serial.flush()
+		time.sleep(0.05)
+		self.serial.baudrate = baudrate
+		self.serial.reset_input_buffer()
+		self.rx.clear()
 
 	def eraseFlash(self):
 		"""
@@ -206,14 +295,118 @@ class PMTK:
 		"""
 		print(self.sendCommand(PMTK_API_Q_FIX_CTRL).strip())
 	
-	def sendCommand(self, cmd):
+	def stream(self, maxsize=256):
+		"""
+		Returns asynchronous iterator over fixes
+		received from GPS module (see NMEAStream)
+		"""
+		return NMEAStream(self.serial, maxsize)
+
+	def sendCommand(self, cmd, timeout=1.0, retries=2):
 		"""
 		Sends command over serial port
-		and returns answer
+		and returns answer as soon as it arrives:
+		its $PMTK001 acknowledgement, or data sentence for queries.
+		Command is sent again after timeout [s], up to retries times.
+		Returns empty string if module never answered, or
+		right away for commands without answer (see expectedAnswer)
+		"""
+		return self.sendCommands([cmd], timeout, retries)[0]
+
+	def sendCommands(self, cmds, timeout=1.0, retries=2):
+		"""
+		Sends a batch of commands at once (pipelined)
+		and returns their answers, in order (see sendCommand).
+		Answers are matched to commands by command ID
+		"""
+		answers = [""]*len(cmds)
+		expected = [self.expectedAnswer(cmd) for cmd in cmds]
+		pending = list(range(0, len(cmds)))
+		for attempt in range(0, retries+1):
+			if (len(pending) == 0):
+				break
+			# outstanding commands, by expected answer
+			waiting = collections.defaultdict(collections.deque)
+			for i in pending:
+				if (expected[i] is not None):
+					waiting[expected[i]].append(i)
+			self.serial.write("".join(cmds[i].strip()+"\r\n" for i in pending).encode("ascii"))
+
+			deadline = time.monotonic() + timeout
+			while (len(waiting) > 0):
+				line = self.readLine(deadline)
+				if (line is None): # timeout
+					break
+				key = self.answerKey(line)
+				if ((key is None) or (key not in waiting)):
+					self.unsolicited.append(line)
+					continue
+				i = waiting[key].popleft()
+				if (len(waiting[key]) == 0):
+					del waiting[key]
+				answers[i] = line
+			# commands without answer are only sent once
+			pending = [i for i in pending if ((expected[i] is not None) and (answers[i] == ""))]
+		return answers
+
+	@staticmethod
+	def commandId(cmd):
+		""" Returns ID of given $PMTK command """
+		return cmd.strip()[5:].split(",")[0].split("*")[0]
+
+	def expectedAnswer(self, cmd):
+		"""
+		Returns key of the sentence answering given command,
+		None if module does not answer it ($PGCMD, baud rate)
+		"""
+		if (not(cmd.strip().startswith("$PMTK"))):
+			return None
+		ID = self.commandId(cmd)
+		if (ID in PMTK_NO_ANSWER):
+			return None
+		if (ID in PMTK_REPLIES):
+			return PMTK_REPLIES[ID]
+		return "$PMTK001," + ID
+
+	def answerKey(self, line):
+		"""
+		Returns key of answer sentence (see expectedAnswer),
+		None for any other sentence or faulty checksum
+		"""
+		if ((line[-3:-2] != "*") or (line[-2:].upper() != Waypoint.checksum(line))):
+			return None
+		if (line.startswith("$PMTK001,")):
+			return "$PMTK001," + line.split(",")[1]
+		header = line.split(",")[0].split("*")[0]
+		if (header in PMTK_REPLIES.values()):
+			return header
+		return None
+
+	def readLine(self, deadline):
+		"""
+		Returns next line received on serial port, from its
+		last '$' (line noise before a sentence is dropped),
+		None if no complete line arrived before deadline
+		"""
+		while (True):
+			end = self.rx.find(b"\n")
+			if (end >= 0):
+				line = self.rx[:end].decode("ascii", "replace").strip()
+				del self.rx[:end+1]
+				return line[max(line.rfind("$"), 0):]
+			remaining = deadline - time.monotonic()
+			if (remaining <= 0):
+				return None
+			self.fill(remaining)
+
+	def fill(self, timeout):
+		"""
+		Waits up to timeout [s] for data
+		and appends everything available to receive buffer
 		"""
-		self.serial.write(bytes(cmd+"\n",encoding="utf-8"))
-		time.sleep(1)
-		return self.serial.readline().decode("utf-8").strip()
+		[readable, _, _] = select.select([self.serial.fileno()], [], [], timeout)
+		if (len(readable) > 0):
+			self.rx += self.serial.read(max(self.serial.in_waiting, 1))
 
 	def openSerial(self, tty, baudrate):
 		"""
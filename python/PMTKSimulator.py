@@ -0,0 +1,217 @@
+import os
+import tty
+import time
+import heapq
+import random
+import select
+import threading
+from synthetic import *
+
+class PMTKSimulator:
+	"""
+	Simulated PMTK3339 GPS module behind a pseudo terminal:
+	replays synthetic NMEA sentences at given rate, answers
+	$PMTK commands and serves $PMTKLOX flash dumps.
+	Line noise & answer latency can be injected.
+	Usage:
+		sim = PMTKSimulator(rate=10)
+		gps = PMTK(sim.open())
+		..
+		sim.close()
+	"""
+
+	def __init__(self, rate=1.0, sentences=("GGA","RMC"), epochs=3600, flash=1000,
+		latency=0.0, noise=0.0, corrupted=0.0, seed=0):
+		"""
+		rate: NMEA epoch rate [Hz], 0 replays as fast as possible
+		sentences: sentences emitted per epoch, among GGA & RMC
+		epochs: number of epochs replayed before NMEA output stops
+		flash: number of records held in flash (LOCUS)
+		latency: delay [s] before answering a command
+		noise: ratio of output lines followed by garbage bytes
+		corrupted: ratio of output sentences with faulty checksum
+		"""
+		self.rate = rate
+		self.sentences = sentences
+		self.epochs = epochs
+		self.flash = flash
+		self.latency = latency
+		self.noise = noise
+		self.corrupted = corrupted
+		self.seed = seed
+		self.rng = random.Random(seed)
+		self.master = None
+		self.slave = None
+		self.thread = None
+		self.running = False
+		self.rx = b""
+		self.output = True # NMEA output enabled
+		self.logging = True
+		self.nmea = None
+		self.nextEpoch = 0.0
+		self.answers = [] # heap of [due time, sequence, data]
+		self.sequence = 0
+		self.commands = 0 # received
+		self.sent = 0 # output lines
+		self.replay(epochs, rate)
+
+	def open(self):
+		"""
+		Starts simulated module,
+		returns path of its serial device
+		"""
+		[self.master, self.slave] = os.openpty()
+		tty.setraw(self.master)
+		tty.setraw(self.slave)
+		self.running = True
+		self.thread = threading.Thread(target=self.run, daemon=True)
+		self.thread.start()
+		return os.ttyname(self.slave)
+
+	def close(self):
+		"""
+		Stops simulated module
+		"""
+		self.running = False
+		if (self.thread is not None):
+			self.thread.join()
+			self.thread = None
+		for fd in [self.master, self.slave]:
+			if (fd is not None):
+				os.close(fd)
+		[self.master, self.slave] = [None, None]
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def replay(self, epochs=None, rate=None):
+		"""
+		(Re)starts NMEA replay of epochs at rate [Hz]
+		"""
+		if (epochs is not None):
+			self.epochs = epochs
+		if (rate is not None):
+			self.rate = rate
+		self.seed += 1
+		self.nmea = nmeaLines(self.epochs, self.rate if (self.rate > 0) else 1.0, self.sentences,
+			self.corrupted, seed=self.seed)
+		self.nextEpoch = time.monotonic()
+
+	def answer(self, *lines):
+		"""
+		Queues answer lines, sent after latency
+		"""
+		data = "".join(line+"\r\n" for line in lines)
+		heapq.heappush(self.answers, [time.monotonic()+self.latency, self.sequence, data])
+		self.sequence += 1
+
+	def handle(self, line):
+		"""
+		Answers one received command line
+		"""
+		line = line.strip()
+		if (not(line.startswith("$PMTK")) or (len(line) < 4) or (line[-3] != "*")):
+			return
+		if (line[-2:].upper() != Waypoint.checksum(line[:-3])):
+			return # module ignores faulty commands
+		self.commands += 1
+		fields = line[5:-3].split(",")
+		ID = fields[0]
+		if (ID == "251"): # baud rate: switched right away, pty ignores it
+			return
+		if (ID == "183"):
+			self.answer(sentence("PMTKLOG,456,0,11,31,2,0,{:d},0,{:d},46".format(
+				0 if self.logging else 1, self.flash)))
+		elif (ID == "400"):
+			self.answer(sentence("PMTK500,{:d},0,0,0,0".format(int(1000/max(self.rate, 1.0)))))
+		elif (ID == "605"):
+			self.answer(sentence("PMTK705,AXN_2.31_3339_13101700,5632,PA6H,1.0"))
+		elif (ID == "622"):
+			self.answer(*locusLines(self.flash, seed=self.seed))
+		elif (ID == "184"):
+			self.flash = 0
+		elif (ID == "185"):
+			self.logging = (fields[1:2] == ["0"])
+		elif (ID == "314"):
+			self.output = any(f != "0" for f in fields[1:])
+		elif (ID == "220"):
+			self.rate = 1000.0/int(fields[1])
+		elif (ID not in ["161","187","300","301","313"]):
+			self.answer(sentence("PMTK001,{:s},1".format(ID))) # unsupported
+			return
+		self.answer(sentence("PMTK001,{:s},3".format(ID)))
+
+	def epoch(self):
+		"""
+		Returns NMEA output due by now
+		"""
+		lines = []
+		now = time.monotonic()
+		while (self.output and (self.nmea is not None) and (self.nextEpoch <= now)):
+			try:
+				line = next(self.nmea)
+			except StopIteration:
+				self.nmea = None
+				break
+			lines.append(line)
+			if (line.startswith("$GPGSA")): # epoch completed
+				if (self.rate > 0):
+					self.nextEpoch += 1.0/self.rate
+				elif (len(lines) >= 1024):
+					break
+		return lines
+
+	def write(self, lines):
+		"""
+		Writes output lines, injecting line noise
+		"""
+		data = ""
+		for line in lines:
+			data += line + "\r\n"
+			if (self.rng.random() < self.noise):
+				data += "".join(chr(self.rng.randrange(32, 127)) for i in range(0, self.rng.randrange(1, 16)))
+		self.sent += len(lines)
+		data = data.encode("ascii")
+		while ((len(data) > 0) and self.running):
+			[_, writable, _] = select.select([], [self.master], [], 0.1)
+			if (len(writable) > 0):
+				data = data[os.write(self.master, data):]
+			else:
+				self.receive(0) # host not reading: keep serving commands
+
+	def receive(self, timeout):
+		"""
+		Waits up to timeout [s] for commands
+		"""
+		[readable, _, _] = select.select([self.master], [], [], timeout)
+		if (len(readable) == 0):
+			return
+		self.rx += os.read(self.master, 4096)
+		while (b"\n" in self.rx):
+			[line, self.rx] = self.rx.split(b"\n", 1)
+			self.handle(line.decode("ascii", "replace"))
+
+	def run(self):
+		"""
+		Simulator thread
+		"""
+		while (self.running):
+			now = time.monotonic()
+			due = []
+			while ((len(self.answers) > 0) and (self.answers[0][0] <= now)):
+				due.append(heapq.heappop(self.answers)[2])
+			if (len(due) > 0):
+				self.write("".join(due).splitlines())
+			lines = self.epoch()
+			if (len(lines) > 0):
+				self.write(lines)
+
+			wakeup = now + 0.1
+			if (len(self.answers) > 0):
+				wakeup = min(wakeup, self.answers[0][0])
+			if (self.output and (self.nmea is not None)):
+				wakeup = min(wakeup, self.nextEpoch)
+			self.receive(max(0.0, wakeup - time.monotonic()))
@@ -0,0 +1,259 @@
+import collections
+import numpy as np
+from GPSTrack import *
+
+class RingTrack(GPSTrack):
+	"""
+	Bounded GPS track for live monitoring: keeps the
+	most recent capacity fixes in preallocated columns.
+	Columns are written twice (ring of 2*capacity rows)
+	so the window is always a contiguous view.
+	Distance, elevation gain, speed, altitude extrema & bounding box
+	of the window are updated on each append, in O(1) amortized time
+	"""
+
+	def __init__(self, capacity):
+		GPSTrack.__init__(self)
+		if (capacity < 1):
+			raise ValueError("RingTrack capacity must be positive")
+		self.capacity = capacity
+		for (name, dtype) in COLUMNS:
+			self._data[name] = np.zeros(2*capacity, dtype=dtype)
+		self._segments = np.zeros(2*capacity) # distance [m] from previous fix
+		self._count = 0 # fixes appended so far, sequence number of next fix
+		self.clear()
+
+	def clear(self):
+		"""
+		Removes all fixes
+		"""
+		self._size = 0
+		self._distance = 0.0
+		self._ascent = 0.0
+		self._speed = float("nan")
+		self._evicted = 0 # since last resynchronization
+		# monotonic deques of [sequence, value]
+		self._extrema = {}
+		for key in ["altMin","altMax","latMin","latMax","lonMin","lonMax","speedMax"]:
+			self._extrema[key] = collections.deque()
+		self._edited(0, 0)
+
+	def _start(self):
+		""" Returns position of oldest fix in columns """
+		return (self._count-1)%self.capacity + self.capacity - self._size + 1
+
+	def _first(self):
+		""" Returns sequence number of oldest fix """
+		return self._count - self._size
+
+	def column(self, name):
+		"""
+		Returns (read only) view of
+		given column, see COLUMNS
+		"""
+		start = self._start()
+		view = self._data[name][start:start+self._size]
+		view.flags.writeable = False
+		return view
+
+	def row(self, index):
+		"""
+		Returns row at given index as a Fix of scalars
+		"""
+		index = self._start() + self._index(index)
+		return Fix(*[self._data[name][index] for (name, _) in COLUMNS])
+
+	def _appendRow(self, fix):
+		""" Appends a single row """
+		self.push(fix)
+
+	def push(self, fix):
+		"""
+		Appends a single fix (Fix of scalars),
+		oldest fix is dropped once capacity is reached
+		"""
+		self.extend(Fix(*[[value] for value in fix]))
+
+	def extend(self, fix):
+		"""
+		Appends rows given as a Fix of arrays,
+		oldest fixes are dropped once capacity is reached
+		"""
+		n = len(fix.lat)
+		if (n == 0):
+			return
+		if (n > self.capacity):
+			# only the most recent rows fit
+			self.clear()
+			fix = Fix(*[np.asarray(c)[n-self.capacity:] for c in fix])
+			n = self.capacity
+		columns = [np.asarray(getattr(fix, name), dtype=dtype) for (name, dtype) in COLUMNS]
+		[lat, lon, alt, time, _] = columns
+
+		# segments from previous fix, in bulk
+		segments = np.zeros(n)
+		if (self._size > 0):
+			last = self.row(-1)
+			segments[0] = haversine(last.lat, last.lon, lat[0], lon[0])
+			previous = [float(last.alt), int(last.time)]
+		if (n > 1):
+			segments[1:] = segmentDistances(lat, lon)
+
+		[lats, lons, alts, times] = [lat.tolist(), lon.tolist(), alt.tolist(), time.tolist()]
+		seg = segments.tolist()
+		for i in range(0, n):
+			if (self._size == self.capacity):
+				self._evict()
+			k = self._count
+			slot = k%self.capacity
+			for (j, (name, _)) in enumerate(COLUMNS):
+				self._data[name][slot] = self._data[name][slot+self.capacity] = columns[j][i]
+			self._segments[slot] = self._segments[slot+self.capacity] = seg[i]
+
+			if (self._size > 0):
+				self._distance += seg[i]
+				self._ascent += max(0.0, alts[i]-previous[0])
+				dt = (times[i]-previous[1])/1000.0
+				self._speed = seg[i]/dt if (dt > 0) else float("nan")
+				if (self._speed == self._speed):
+					self._push("speedMax", k, -self._speed)
+			previous = [alts[i], times[i]]
+			self._push("altMin", k, alts[i])
+			self._push("altMax", k, -alts[i])
+			self._push("latMin", k, lats[i])
+			self._push("latMax", k, -lats[i])
+			self._push("lonMin", k, lons[i])
+			self._push("lonMax", k, -lons[i])
+			self._count += 1
+			self._size += 1
+		self._edited(self._size-n, self._size)
+
+	def _push(self, key, k, value):
+		""" Pushes value into monotonic (increasing) deque """
+		deque = self._extrema[key]
+		while ((len(deque) > 0) and (deque[-1][1] > value)):
+			deque.pop()
+		deque.append([k, value])
+
+	def _evict(self):
+		"""
+		Drops oldest fix from window statistics
+		"""
+		start = self._start()
+		self._size -= 1
+		first = self._first()
+		if (self._size > 0):
+			self._distance -= self._segments[start+1]
+			self._ascent -= max(0.0, float(self._data["alt"][start+1]-self._data["alt"][start]))
+		self._derived = {} # window moved: memoized series are shifted
+		for (key, deque) in self._extrema.items():
+			# speeds are keyed by segment end
+			while ((len(deque) > 0) and ((deque[0][0] < first) or ((key == "speedMax") and (deque[0][0] == first)))):
+				deque.popleft()
+		self._evicted += 1
+		if (self._evicted >= self.capacity):
+			self._resync()
+
+	def _resync(self):
+		"""
+		Recomputes running sums from window,
+		cancels floating point drift
+		"""
+		self._evicted = 0
+		start = self._start()
+		self._distance = float(self._segments[start+1:start+self._size].sum())
+		gain = np.diff(self.column("alt").astype(np.float64))
+		self._ascent = float(gain[gain > 0].sum())
+
+	def __setitem__(self, index, wp):
+		""" Sets waypoint at given index in window """
+		index = self._index(index)
+		fix = self.waypointToFix(wp)
+		position = self._start() + index
+		for (name, _) in COLUMNS:
+			self._data[name][position] = self._data[name][(position+self.capacity)%(2*self.capacity)] = getattr(fix, name)
+		# rebuild statistics from window
+		columns = [np.array(c) for c in self.columns()]
+		self.clear()
+		self.extend(Fix(*columns))
+
+	def __delitem__(self, index):
+		raise TypeError("RingTrack only supports appending")
+
+	def insert(self, index, waypoints):
+		raise TypeError("RingTrack only supports appending")
+
+	def _edited(self, start, stop):
+		"""
+		Called after rows [start, stop[ have been
+		appended, keeps derived indexes consistent
+		"""
+		self._spatialIndex = None
+		self._simplified = {}
+		for entry in self._derived.values():
+			entry[0] = min(entry[0], start)
+		if ((self._timeOrder is None) and (stop > start)):
+			# still sorted if appended rows fit in (evictions keep order)
+			time = self.column("time")[max(start-1, 0):stop]
+			if (np.any(time[1:] < time[:-1])):
+				self._timeOrder = False
+		elif (self._size > 0):
+			self._timeOrder = False
+
+	def totalDistance(self):
+		"""
+		Returns distance [m] covert in window
+		"""
+		return self._distance
+
+	def elevationGain(self):
+		"""
+		Returns cumulated ascent [m] in window
+		"""
+		return self._ascent
+
+	def currentSpeed(self):
+		"""
+		Returns speed [m/s] over last segment,
+		NaN when unknown
+		"""
+		return self._speed
+
+	def maxSpeed(self):
+		"""
+		Returns maximal segment speed [m/s] in window,
+		NaN when unknown
+		"""
+		deque = self._extrema["speedMax"]
+		if (len(deque) == 0):
+			return float("nan")
+		return -deque[0][1]
+
+	def highestPoint(self):
+		"""
+		Returns index of waypoint with
+		highest altitude
+		"""
+		if (self._size == 0):
+			return 0
+		return self._extrema["altMax"][0][0] - self._first()
+
+	def lowestPoint(self):
+		"""
+		Returns index of waypoint with
+		lowest altitude
+		"""
+		if (self._size == 0):
+			return 0
+		return self._extrema["altMin"][0][0] - self._first()
+
+	def boundingBox(self):
+		"""
+		Returns window bounding box
+		[latMin, lonMin, latMax, lonMax],
+		None when empty
+		"""
+		if (self._size == 0):
+			return None
+		e = self._extrema
+		return [e["latMin"][0][1], e["lonMin"][0][1], -e["latMax"][0][1], -e["lonMax"][0][1]]
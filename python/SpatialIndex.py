@@ -0,0 +1,113 @@
+import math
+import numpy as np
+from geodesy import *
+
+class SpatialIndex:
+	"""
+	Uniform grid over lat/lon coordinates
+	(decimal degrees). Points are sorted by cell,
+	a cell is located by binary search over cell keys.
+	Answers bounding box, radius & nearest neighbours queries
+	"""
+
+	def __init__(self, lat, lon, pointsPerCell=8):
+		"""
+		Builds grid over given coordinates,
+		cell size is chosen so a cell holds about
+		pointsPerCell consecutive points of the track
+		"""
+		self.lat = np.asarray(lat, dtype=np.float64)
+		self.lon = np.asarray(lon, dtype=np.float64)
+		n = len(self.lat)
+		if (n == 0):
+			[self.lat0, self.lon0, self.cellLat, self.cellLon, self.ny] = [0.0, 0.0, 1.0, 1.0, 1]
+			self.keys = np.zeros(0, dtype=np.int64)
+			self.order = np.zeros(0, dtype=np.int64)
+			return
+
+		self.lat0 = float(self.lat.min())
+		self.lon0 = float(self.lon.min())
+		# longitude degrees shrink with latitude: use worst case
+		cosLat = max(math.cos(math.radians(max(abs(self.lat0), abs(float(self.lat.max()))))), 0.01)
+		step = 0.0
+		if (n > 1):
+			step = float(np.median(np.hypot(np.diff(self.lat), np.diff(self.lon)*cosLat)))
+		self.cellLat = max(step*pointsPerCell, 1e-6)
+		self.cellLon = self.cellLat/cosLat
+		self.ny = int((float(self.lat.max())-self.lat0)//self.cellLat)+1
+
+		keys = self.cellKeys(self.lat, self.lon)
+		self.order = np.argsort(keys, kind="stable")
+		self.keys = keys[self.order]
+
+	def cellKeys(self, lat, lon):
+		""" Returns cell key of given coordinates """
+		ix = np.floor((lon-self.lon0)/self.cellLon).astype(np.int64)
+		iy = np.floor((lat-self.lat0)/self.cellLat).astype(np.int64)
+		return ix*self.ny + iy
+
+	def candidates(self, latMin, lonMin, latMax, lonMax):
+		"""
+		Returns indexes of points within cells
+		overlapping given bounding box
+		"""
+		n = len(self.keys)
+		iy0 = max(int(math.floor((latMin-self.lat0)/self.cellLat)), 0)
+		iy1 = min(int(math.floor((latMax-self.lat0)/self.cellLat)), self.ny-1)
+		ix0 = int(math.floor((lonMin-self.lon0)/self.cellLon))
+		ix1 = int(math.floor((lonMax-self.lon0)/self.cellLon))
+		if ((n == 0) or (iy0 > iy1) or (ix0 > ix1)):
+			return np.zeros(0, dtype=np.int64)
+		ix0 = max(ix0, int(self.keys[0]//self.ny))
+		ix1 = min(ix1, int(self.keys[-1]//self.ny))
+		if (ix1-ix0+1 > n): # box larger than track: scan all
+			return np.arange(n)
+		# cells of a grid column are consecutive keys
+		ix = np.arange(ix0, ix1+1, dtype=np.int64)
+		starts = np.searchsorted(self.keys, ix*self.ny+iy0, side="left")
+		stops = np.searchsorted(self.keys, ix*self.ny+iy1, side="right")
+		if (len(ix) == 0):
+			return np.zeros(0, dtype=np.int64)
+		return self.order[np.concatenate([np.arange(a, b) for (a, b) in zip(starts.tolist(), stops.tolist())])]
+
+	def boundingBox(self, latMin, lonMin, latMax, lonMax):
+		"""
+		Returns sorted indexes of points
+		within given bounding box (included)
+		"""
+		idx = self.candidates(latMin, lonMin, latMax, lonMax)
+		lat = self.lat[idx]
+		lon = self.lon[idx]
+		keep = (lat >= latMin) & (lat <= latMax) & (lon >= lonMin) & (lon <= lonMax)
+		return np.sort(idx[keep])
+
+	def radius(self, lat, lon, radius):
+		"""
+		Returns [indexes, distances] of points within
+		radius [m] of given coordinates, closest first
+		"""
+		dLat = math.degrees(radius/EARTH_RADIUS)
+		cosLat = max(math.cos(math.radians(min(abs(lat)+dLat, 90.0))), 1e-6)
+		dLon = min(dLat/cosLat, 360.0)
+		idx = self.candidates(lat-dLat, lon-dLon, lat+dLat, lon+dLon)
+		dist = haversine(lat, lon, self.lat[idx], self.lon[idx])
+		keep = dist <= radius
+		[idx, dist] = [idx[keep], dist[keep]]
+		order = np.lexsort((idx, dist))
+		return [idx[order], dist[order]]
+
+	def nearest(self, lat, lon, k=1):
+		"""
+		Returns [indexes, distances] of the k points
+		closest to given coordinates, closest first
+		"""
+		n = len(self.lat)
+		k = min(k, n)
+		if (k == 0):
+			return [np.zeros(0, dtype=np.int64), np.zeros(0)]
+		r = math.radians(self.cellLat)*EARTH_RADIUS
+		while (True):
+			[idx, dist] = self.radius(lat, lon, r)
+			if ((len(idx) >= k) or (r > math.pi*EARTH_RADIUS)):
+				return [idx[:k], dist[:k]]
+			r *= 4
@@ -0,0 +1,154 @@
+import os
+import shutil
+import hashlib
+import numpy as np
+from Waypoint import *
+
+class TrackCache:
+	"""
+	On disk cache of parsed GPS tracks.
+	Each entry is a directory holding one .npy file per column,
+	keyed by source path, size, modification time & parser version.
+	Entries are memory mapped when loaded,
+	least recently used ones are evicted past maxSize bytes
+	"""
+
+	instance = None
+
+	def __init__(self, directory=None, maxSize=1<<30, minSize=1<<20):
+		"""
+		Creates a cache in given directory
+		(defaults to $GPS_LOGGER_CACHE or ~/.cache/gps-logger).
+		maxSize [bytes]: cache size bound
+		minSize [bytes]: smaller source files are not worth caching
+		"""
+		if (directory is None):
+			directory = os.environ.get("GPS_LOGGER_CACHE",
+				os.path.join(os.path.expanduser("~"), ".cache", "gps-logger"))
+		self.directory = directory
+		self.maxSize = maxSize
+		self.minSize = minSize
+
+	@classmethod
+	def default(cls):
+		"""
+		Returns the cache shared by all tracks
+		"""
+		if (cls.instance is None):
+			cls.instance = cls()
+		return cls.instance
+
+	def pathKey(self, fp):
+		""" Returns key prefix shared by all entries of given source """
+		return hashlib.sha1(os.path.abspath(fp).encode("utf-8")).hexdigest()
+
+	def key(self, fp, version):
+		"""
+		Returns entry key for given source file & parser version,
+		None if file is too small to be cached
+		"""
+		st = os.stat(fp)
+		if (st.st_size < self.minSize):
+			return None
+		fingerprint = "{:d}:{:d}:{}".format(st.st_size, st.st_mtime_ns, version)
+		return self.pathKey(fp) + "-" + hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:16]
+
+	def load(self, fp, version, key=None):
+		"""
+		Returns memory mapped columns (Fix)
+		of given source file, None on cache miss.
+		key: entry key, see key() (computed if not given)
+		"""
+		if (key is None):
+			key = self.key(fp, version)
+		if (key is None):
+			return None
+		entry = os.path.join(self.directory, key)
+		try:
+			columns = [np.load(os.path.join(entry, name+".npy"), mmap_mode="r") for (name, _) in COLUMNS]
+		except (OSError, ValueError): # missing or partial entry
+			return None
+		try:
+			os.utime(entry) # LRU bookkeeping
+		except FileNotFoundError: # evicted meanwhile, mapped columns still valid
+			pass
+		return Fix(*columns)
+
+	def store(self, fp, fix, version, key=None):
+		"""
+		Stores columns (Fix) parsed from given source file.
+		key: entry key taken before parsing, so a file modified
+		meanwhile is not stored under its new fingerprint
+		"""
+		if (key is None):
+			key = self.key(fp, version)
+		if (key is None):
+			return
+		os.makedirs(self.directory, exist_ok=True)
+		self.invalidate(fp) # previous versions of this file
+		
+		# write into a temporary directory, then rename atomically
+		entry = os.path.join(self.directory, key)
+		tmp = "{:s}.{:d}.tmp".format(entry, os.getpid())
+		os.makedirs(tmp, exist_ok=True)
+		try:
+			for (name, dtype) in COLUMNS:
+				np.save(os.path.join(tmp, name+".npy"), np.asarray(getattr(fix, name), dtype=dtype))
+			os.rename(tmp, entry)
+		except OSError: # concurrent store of the same entry
+			shutil.rmtree(tmp, ignore_errors=True)
+		self.evict()
+
+	def invalidate(self, fp):
+		"""
+		Removes all entries of given source file
+		"""
+		if (not(os.path.isdir(self.directory))):
+			return
+		prefix = self.pathKey(fp) + "-"
+		for name in os.listdir(self.directory):
+			if (name.startswith(prefix)):
+				shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+	def clear(self):
+		"""
+		Removes all entries
+		"""
+		shutil.rmtree(self.directory, ignore_errors=True)
+
+	def entries(self):
+		"""
+		Returns [path, size, last access] of all entries,
+		least recently used first
+		"""
+		entries = []
+		if (not(os.path.isdir(self.directory))):
+			return entries
+		for name in os.listdir(self.directory):
+			path = os.path.join(self.directory, name)
+			if (name.endswith(".tmp") or not(os.path.isdir(path))):
+				continue
+			try:
+				size = sum(f.stat().st_size for f in os.scandir(path))
+				entries.append([path, size, os.stat(path).st_mtime])
+			except FileNotFoundError: # removed by a concurrent process
+				continue
+		entries.sort(key=lambda e: e[2])
+		return entries
+
+	def size(self):
+		""" Returns total cache size [bytes] """
+		return sum(e[1] for e in self.entries())
+
+	def evict(self):
+		"""
+		Removes least recently used entries
+		until cache fits in maxSize
+		"""
+		entries = self.entries()
+		total = sum(e[1] for e in entries)
+		for [path, size, _] in entries:
+			if (total <= self.maxSize):
+				break
+			shutil.rmtree(path, ignore_errors=True)
+			total -= size
@@ -0,0 +1,259 @@
+#! /usr/bin/env python3
+"""
+GPS track benchmark suite: generates synthetic logs
+and reports throughput & peak memory as JSON
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import contextlib
+
+from GPSTrack import *
+from synthetic import *
+from PMTK import *
+from PMTKSimulator import *
+
+class RecordingMap:
+	"""
+	Stand-in for the qOSM map widget:
+	records every call & its payload size
+	"""
+
+	def __init__(self):
+		self.calls = []
+
+	def record(self, method, *args, **kwargs):
+		payload = sum(len(str(a)) for a in args) + sum(len(str(v)) for v in kwargs.values())
+		self.calls.append([method, payload])
+
+	def __getattr__(self, method):
+		return lambda *args, **kwargs: self.record(method, *args, **kwargs)
+
+	def payload(self):
+		""" Returns total payload size [characters] """
+		return sum(c[1] for c in self.calls)
+
+def forget(track):
+	"""
+	Drops memoized statistics & indexes of track,
+	so next calls compute them from scratch
+	"""
+	track._derived = {}
+	track._simplified = {}
+	track._spatialIndex = None
+
+def measure(name, fn, points, repeat=3, setup=None):
+	"""
+	Runs fn repeat times, returns best timing,
+	throughput [points/s] & peak traced memory [bytes].
+	setup() (not timed) is called before each run
+	"""
+	best = float("inf")
+	for i in range(0, repeat):
+		if (setup is not None):
+			setup()
+		with open(os.devnull, "w") as null, contextlib.redirect_stdout(null):
+			start = time.perf_counter()
+			fn()
+			best = min(best, time.perf_counter()-start)
+
+	if (setup is not None):
+		setup()
+	tracemalloc.start()
+	with open(os.devnull, "w") as null, contextlib.redirect_stdout(null):
+		fn()
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+
+	return {
+		"name": name,
+		"points": points,
+		"seconds": best,
+		"points_per_second": points/best if (best > 0) else None,
+		"peak_bytes": peak,
+	}
+
+def run(args, workdir):
+	"""
+	Generates workloads into workdir
+	and runs all benchmarks
+	"""
+	n = args.points
+	sentences = {"gga": ("GGA",), "rmc": ("RMC",), "both": ("GGA","RMC")}[args.mix]
+	logs = {
+		"nmea": os.path.join(workdir, "synthetic.nmea"),
+		"locus": os.path.join(workdir, "synthetic.locus"),
+		"kml": os.path.join(workdir, "synthetic.kml"),
+	}
+	writeLines(logs["nmea"], nmeaLines(n, args.rate, sentences, args.corrupted, seed=args.seed))
+	writeLines(logs["locus"], locusLines(n, args.rate, args.corrupted, seed=args.seed))
+	writeLines(logs["kml"], kmlLines(n, args.rate, seed=args.seed))
+
+	results = []
+	for (kind, fp) in logs.items():
+		results.append(measure("parse." + kind, lambda fp=fp: GPSTrack(fp, cache=False), n, args.repeat))
+
+	track = GPSTrack(logs["nmea"], cache=False)
+	m = len(track)
+	for method in ["totalDistance", "accumulatedDistance", "instantSpeed",
+		"averageSpeed", "elevationProfile", "elevationSummary", "highestPoint", "lowestPoint"]:
+		results.append(measure("track." + method, getattr(track, method), m, args.repeat,
+			setup=lambda: forget(track)))
+		if (method not in ["instantSpeed", "elevationSummary"]):
+			# memoized: track not edited since previous call
+			results.append(measure("track." + method + ".cached", getattr(track, method), m, args.repeat))
+
+	for zoom in [11, 16]:
+		for tolerance in [None, 0]:
+			name = "render.drawOnMap.zoom{:d}".format(zoom) + (".full" if (tolerance == 0) else "")
+			result = measure(name, lambda: track.drawOnMap(RecordingMap(), zoom, tolerance), m, args.repeat,
+				setup=lambda: forget(track))
+			recorder = RecordingMap()
+			track.drawOnMap(recorder, zoom, tolerance)
+			result["map_calls"] = len(recorder.calls)
+			result["map_payload_chars"] = recorder.payload()
+			results.append(result)
+
+	for exporter in ["toKML", "toGPX", "toCSV"]:
+		fp = os.path.join(workdir, "export." + exporter[2:].lower())
+		results.append(measure("export." + exporter, lambda e=exporter, fp=fp: getattr(track, e)(fp), m, args.repeat))
+
+	return results
+
+def latencies(name, samples):
+	"""
+	Returns latency statistics [s] of given samples
+	"""
+	samples = sorted(samples)
+	return {
+		"name": name,
+		"points": len(samples),
+		"seconds": sum(samples),
+		"mean": sum(samples)/len(samples),
+		"p50": samples[len(samples)//2],
+		"p99": samples[min(len(samples)-1, int(len(samples)*0.99))],
+		"max": samples[-1],
+	}
+
+async def ingest(stream, idle=0.5):
+	"""
+	Consumes stream until idle [s] without fix,
+	returns [fixes, seconds between first & last fix]
+	"""
+	[n, first, last] = [0, None, None]
+	async with stream:
+		while (True):
+			try:
+				await asyncio.wait_for(stream.__anext__(), idle)
+			except (asyncio.TimeoutError, StopAsyncIteration):
+				break
+			last = time.perf_counter()
+			if (first is None):
+				first = last
+			n += 1
+	return [n, (last-first) if (n > 1) else 0.0]
+
+def runSerial(args):
+	"""
+	Runs serial link benchmarks through PMTK
+	against a simulated GPS module
+	"""
+	n = args.points
+	sentences = {"gga": ("GGA",), "rmc": ("RMC",), "both": ("GGA","RMC")}[args.mix]
+	results = []
+	with PMTKSimulator(rate=1.0, sentences=sentences, flash=n, latency=args.latency,
+		noise=args.noise, corrupted=args.corrupted, seed=args.seed) as sim:
+		gps = PMTK(sim.open())
+
+		samples = []
+		for i in range(0, args.commands):
+			start = time.perf_counter()
+			gps.sendCommand(PMTK_Q_RELEASE)
+			samples.append(time.perf_counter()-start)
+		results.append(latencies("serial.command", samples))
+
+		batch = [PMTK_Q_RELEASE, PMTK_STATUS_QUERY, PMTK_API_Q_FIX_CTRL, PMTK_ENABLE_SBAS]
+		samples = []
+		for i in range(0, max(1, args.commands//len(batch))):
+			start = time.perf_counter()
+			gps.sendCommands(batch)
+			samples.append(time.perf_counter()-start)
+		results.append(latencies("serial.batch{:d}".format(len(batch)), samples))
+
+		best = None
+		for i in range(0, args.repeat):
+			start = time.perf_counter()
+			track = gps.dumpFlash()
+			seconds = time.perf_counter()-start
+			if ((best is None) or (seconds < best["seconds"])):
+				best = {
+					"name": "serial.dumpFlash",
+					"points": len(track),
+					"seconds": seconds,
+					"points_per_second": len(track)/seconds,
+					"records": n,
+				}
+		results.append(best)
+
+		gps.sendCommand(PMTK_SET_NMEA_OUTPUT_RMC_GGA)
+		sim.replay(n, args.stream_rate)
+		[fixes, seconds] = asyncio.run(ingest(gps.stream()))
+		results.append({
+			"name": "serial.stream",
+			"points": fixes,
+			"seconds": seconds,
+			"points_per_second": fixes/seconds if (seconds > 0) else None,
+			"sentences": sim.sent,
+			"rate": args.stream_rate,
+		})
+	return results
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="GPS track benchmark suite")
+	parser.add_argument("--points", type=int, default=100000, help="number of epochs")
+	parser.add_argument("--rate", type=float, default=1.0, help="epoch rate [Hz], 1 to 10")
+	parser.add_argument("--mix", choices=["gga","rmc","both"], default="both", help="NMEA sentences per epoch")
+	parser.add_argument("--corrupted", type=float, default=0.01, help="ratio of faulty checksums")
+	parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark, best is kept")
+	parser.add_argument("--seed", type=int, default=0)
+	parser.add_argument("--workdir", default=None, help="keep generated logs in this directory")
+	parser.add_argument("--output", default=None, help="JSON report file (stdout by default)")
+	parser.add_argument("--serial", action="store_true", help="benchmark serial link against a simulated module instead")
+	parser.add_argument("--commands", type=int, default=200, help="serial: number of timed commands")
+	parser.add_argument("--latency", type=float, default=0.0, help="serial: module answer latency [s]")
+	parser.add_argument("--noise", type=float, default=0.0, help="serial: ratio of lines followed by garbage")
+	parser.add_argument("--stream-rate", type=float, default=0.0, help="serial: NMEA epoch rate [Hz], 0 as fast as possible")
+	args = parser.parse_args(argv)
+
+	if (args.serial):
+		results = runSerial(args)
+	elif (args.workdir is None):
+		with tempfile.TemporaryDirectory() as workdir:
+			results = run(args, workdir)
+	else:
+		os.makedirs(args.workdir, exist_ok=True)
+		results = run(args, args.workdir)
+
+	report = {
+		"timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+		"python": platform.python_version(),
+		"machine": platform.machine(),
+		"parameters": vars(args),
+		"results": results,
+	}
+	if (args.output is None):
+		json.dump(report, sys.stdout, indent=2)
+		sys.stdout.write("\n")
+	else:
+		with open(args.output, "w") as fd:
+			json.dump(report, fd, indent=2)
+
+if __name__ == "__main__":
+	main()
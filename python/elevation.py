@@ -0,0 +1,103 @@
+import collections
+import numpy as np
+
+# elevation analysis of a track,
+# lowest/highest: indexes, ascent/descent [m], grade: per segment [m/m]
+Summary = collections.namedtuple("Summary", ["lowest","highest","ascent","descent","grade"])
+
+def extrema(alt):
+	"""
+	Returns [lowest, highest] indexes
+	(first occurrences) of altitudes
+	"""
+	alt = np.asarray(alt)
+	if (len(alt) == 0):
+		return [0, 0]
+	return [int(np.argmin(alt)), int(np.argmax(alt))]
+
+def turningPoints(alt):
+	"""
+	Returns altitudes where profile changes direction,
+	first & last altitudes included
+	"""
+	alt = np.asarray(alt, dtype=np.float64)
+	if (len(alt) < 3):
+		return alt
+	d = np.diff(alt)
+	moves = np.flatnonzero(d) # flat sections are skipped
+	sign = np.sign(d[moves])
+	turns = moves[1:][sign[1:] != sign[:-1]]
+	return np.concatenate([alt[:1], alt[turns], alt[-1:]])
+
+def ascentDescent(alt, hysteresis=0.0):
+	"""
+	Returns [ascent, descent] [m] of altitude profile.
+	hysteresis [m]: variations smaller than this
+	threshold are considered noise and ignored
+	"""
+	if (hysteresis <= 0):
+		d = np.diff(np.asarray(alt, dtype=np.float64))
+		return [float(d[d > 0].sum()), float(-d[d < 0].sum())]
+
+	# only turning points matter: monotonic runs telescope
+	points = turningPoints(alt).tolist()
+	if (len(points) == 0):
+		return [0.0, 0.0]
+	[ascent, descent] = [0.0, 0.0]
+	[low, high] = [points[0], points[0]]
+	direction = 0 # unknown until a variation exceeds threshold
+	for a in points[1:]:
+		if (direction == 0):
+			[low, high] = [min(low, a), max(high, a)]
+			if (high - low >= hysteresis):
+				direction = 1 if (a == high) else -1
+				[ref, ext] = [low, high] if (direction > 0) else [high, low]
+		elif (direction > 0):
+			if (a > ext):
+				ext = a
+			elif (ext - a >= hysteresis):
+				ascent += ext - ref
+				[ref, ext, direction] = [ext, a, -1]
+		else:
+			if (a < ext):
+				ext = a
+			elif (a - ext >= hysteresis):
+				descent += ref - ext
+				[ref, ext, direction] = [ext, a, 1]
+	# last leg
+	if (direction > 0):
+		ascent += ext - ref
+	elif (direction < 0):
+		descent += ref - ext
+	return [ascent, descent]
+
+def grade(alt, distances):
+	"""
+	Returns grade [m/m] of each segment,
+	from altitudes & segment distances [m].
+	NaN where distance is 0
+	"""
+	d = np.diff(np.asarray(alt, dtype=np.float64))
+	return slope(d, distances)
+
+def slope(d, distances):
+	""" Returns d/distances, NaN where distance is 0 """
+	distances = np.asarray(distances, dtype=np.float64)
+	g = np.full(len(d), np.nan)
+	np.divide(d, distances, out=g, where=(distances != 0))
+	return g
+
+def summary(alt, distances, hysteresis=0.0):
+	"""
+	Returns Summary of altitude profile,
+	distances: segment distances [m],
+	hysteresis [m]: ascent/descent noise threshold
+	"""
+	alt = np.asarray(alt, dtype=np.float64)
+	d = np.diff(alt)
+	[lowest, highest] = extrema(alt)
+	if (hysteresis <= 0):
+		[ascent, descent] = [float(d[d > 0].sum()), float(-d[d < 0].sum())]
+	else:
+		[ascent, descent] = ascentDescent(alt, hysteresis)
+	return Summary(lowest, highest, ascent, descent, slope(d, distances))
@@ -0,0 +1,47 @@
+import numpy as np
+
+# mean earth radius [m]
+EARTH_RADIUS = 6371000.0
+
+def haversine(lat1, lon1, lat2, lon2):
+	"""
+	Returns distance [m] between coordinates
+	given in decimal degrees, using Haversine formula.
+	Accepts scalars or arrays (element wise)
+	"""
+	lat1 = np.radians(lat1)
+	lat2 = np.radians(lat2)
+	deltaLat = lat2-lat1
+	deltaLon = np.radians(lon2)-np.radians(lon1)
+	a = np.sin(deltaLat/2)**2 + np.cos(lat1)*np.cos(lat2)*np.sin(deltaLon/2)**2
+	return 2*EARTH_RADIUS*np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def segmentDistances(lat, lon):
+	"""
+	Returns the n-1 distances [m] between
+	consecutive coordinates of a track
+	"""
+	lat = np.asarray(lat, dtype=np.float64)
+	lon = np.asarray(lon, dtype=np.float64)
+	return haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
+
+def cumulativeDistance(lat, lon):
+	"""
+	Returns accumulated distance [m] at each
+	coordinate of a track, starting at 0
+	"""
+	acc = np.zeros(len(lat), dtype=np.float64)
+	if (len(lat) > 1):
+		np.cumsum(segmentDistances(lat, lon), out=acc[1:])
+	return acc
+
+def segmentSpeeds(distances, time):
+	"""
+	Returns speed [m/s] over each segment,
+	from segment distances [m] and epoch times [ms].
+	Segments with no time difference are NaN
+	"""
+	dt = np.diff(np.asarray(time, dtype=np.int64))/1000.0
+	speed = np.full(len(dt), np.nan)
+	np.divide(distances, dt, out=speed, where=(dt != 0))
+	return speed
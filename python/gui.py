@@ -165,29 +165,24 @@ class MainWindow (QMainWindow):
 	def open(self):
 		"""
 		Called when 'open' from toolbar was clicked
-		TODO: allow multiple files selection
 		"""
 		self.qdialog = QFileDialog(self)
 		self.qdialog.setDirectory("data")
+		self.qdialog.setFileMode(QFileDialog.ExistingFiles)
 		self.qdialog.finished.connect(self.openDialogConfirmed)
 		self.qdialog.show()
 	
 	def openDialogConfirmed(self, confirmed):
 		"""
-		Called when file dialog has been confirmed
-		TODO:
-			+ handle list of files
+		Called when file dialog has been confirmed,
+		selected files are merged into a single track
 		"""
 		if not(confirmed):
 			return 0
 
 		files = self.qdialog.selectedFiles()
-		self.track = GPSTrack(files[0])
-		for fp in files[1:]:
-			self.track.append(GPSTrack(fp).getWaypoints())
+		self.track = GPSTrack.fromFiles(files)
 		
-		self.clearPlots() # clear previous plots
-
 		# visualize track on map
 		self.track.drawOnMap(self.map)
 
@@ -196,7 +191,16 @@ class MainWindow (QMainWindow):
 			item = QTreeWidgetItem(self.qtree, str(self.track[i]).split('|'))
 			self.qtree.addTopLevelItem(item)
 
-		# instant speed
+		self.plotTrack()
+
+	def plotTrack(self):
+		"""
+		(Re)draws speed, distance
+		& elevation plots of the track
+		"""
+		self.clearPlots() # clear previous plots
+
+		# instant speed
 		self.plots[1].plot(self.track.instantSpeed())
 
 		# accumulated distance
@@ -225,8 +229,7 @@ class MainWindow (QMainWindow):
 		Removes all waypoints from GPS track
 		Removes focused markers
 		"""
-		for i in range(0, len(self.track)):
-			self.map.deleteMarker(str(i))
+		self.track.clearMap(self.map)
 
 	def clear(self, clicked):
 		"""
@@ -246,12 +249,20 @@ class MainWindow (QMainWindow):
 		in the track handler
 		"""
 		item = self.qtree.currentItem()
-		text = item.text(0)
-		format = '%Y-%m-%d %H:%M:%S'
-		date = datetime.datetime.strptime(text,format)
+		if (item is None):
+			return
+		date = datetime.datetime.fromisoformat(item.text(0))
 		index = self.track.searchByDate(date)
-		self.map.deleteMarker(str(index))
-		self.qtree.removeItemWidget(item)
+		if (index < 0): # not in track (anymore)
+			return
+		del self.track[index]
+		self.qtree.takeTopLevelItem(self.qtree.indexOfTopLevelItem(item))
+		if (len(self.track) > 0):
+			self.track.drawOnMap(self.map) # track is a single polyline
+			self.plotTrack() # plots are indexed like the track
+		else:
+			self.clearMap()
+			self.clearPlots()
 
 	def listItemChanged(self, current, previous):
 		if (len(self.qtree.selectedItems()) == 0):
@@ -268,14 +279,20 @@ class MainWindow (QMainWindow):
 		indexes = []
 		for item in items:
 			# use date to retrieve waypoint
-			date = datetime.datetime.strptime(
-				item.text(0), # date
-				'%Y-%m-%d %H:%M:%S'
-			)
+			date = datetime.datetime.fromisoformat(item.text(0))
 
 			indexes.append(self.track.searchByDate(date))
 
 		self.track.highlightOnMap(self.map, indexes[0], indexes[1])
+		self.statusBar().showMessage(
+			"Selection: {:.0f} m in {:.0f} s, {:.2f} m/s average, +{:.0f} m / -{:.0f} m".format(
+				self.track.spanDistance(indexes[0], indexes[1]),
+				self.track.spanDuration(indexes[0], indexes[1]),
+				self.track.averageSpeed(indexes),
+				self.track.spanAscent(indexes[0], indexes[1]),
+				self.track.spanDescent(indexes[0], indexes[1])
+			)
+		)
 		
 		# indicate current selection on elevation profile
 		elevationProfile = self.plots[0].getPlotItem()
@@ -307,12 +324,11 @@ class MainWindow (QMainWindow):
 	def exit(self):
 		print("tut")
 
-app = QApplication([])
-win = MainWindow()
-pg.setConfigOptions(antialias=True)
-
 if __name__ == '__main__':
-	QApplication.instance().exec_()
+	# GUI is only built by the main process: fromFiles()
+	# workers (spawn) import this module too
 	app = QApplication(sys.argv)
 	app.setStyle("plastique")
+	pg.setConfigOptions(antialias=True)
+	win = MainWindow()
 	sys.exit(app.exec_())
@@ -0,0 +1,120 @@
+import math
+import heapq
+import numpy as np
+from geodesy import *
+
+def project(lat, lon):
+	"""
+	Projects coordinates [decimal degrees] onto a local
+	equirectangular plane, returns [x, y] in meters
+	"""
+	lat = np.asarray(lat, dtype=np.float64)
+	lon = np.asarray(lon, dtype=np.float64)
+	cosLat = math.cos(math.radians(float(lat.mean()))) if (len(lat) > 0) else 1.0
+	return [np.radians(lon)*EARTH_RADIUS*cosLat, np.radians(lat)*EARTH_RADIUS]
+
+def farthest(x, y, i, j):
+	"""
+	Returns [index, distance] of the point within ]i:j[
+	farthest from segment (i, j)
+	"""
+	px = x[i+1:j]-x[i]
+	py = y[i+1:j]-y[i]
+	dx = x[j]-x[i]
+	dy = y[j]-y[i]
+	norm = dx*dx+dy*dy
+	if (norm > 0):
+		t = np.clip((px*dx+py*dy)/norm, 0.0, 1.0)
+		px = px-t*dx
+		py = py-t*dy
+	d = px*px+py*py
+	k = int(np.argmax(d))
+	return [i+1+k, math.sqrt(d[k])]
+
+def douglasPeucker(x, y, tolerance=None, count=None):
+	"""
+	Douglas-Peucker simplification (iterative):
+	segments are split at their farthest point, largest
+	deviation first, until every point lies within
+	tolerance [m] or count points are kept.
+	Returns sorted indexes of kept points
+	"""
+	if ((tolerance is None) and (count is None)):
+		raise ValueError("Either a tolerance or a point count is required")
+	n = len(x)
+	if (n <= 2):
+		return np.arange(n)
+	keep = np.zeros(n, dtype=bool)
+	keep[0] = keep[-1] = True
+	kept = 2
+
+	heap = []
+	def push(i, j):
+		if (j-i > 1):
+			[k, d] = farthest(x, y, i, j)
+			heapq.heappush(heap, (-d, i, j, k))
+
+	push(0, n-1)
+	while (len(heap) > 0):
+		if ((count is not None) and (kept >= count)):
+			break
+		[d, i, j, k] = heapq.heappop(heap)
+		if ((tolerance is not None) and (-d <= tolerance)):
+			break
+		keep[k] = True
+		kept += 1
+		push(i, k)
+		push(k, j)
+	return np.flatnonzero(keep)
+
+def visvalingam(x, y, tolerance=None, count=None):
+	"""
+	Visvalingam-Whyatt simplification: the point forming
+	the smallest triangle with its neighbours is removed first,
+	until all effective areas exceed tolerance² [m²]
+	or count points remain.
+	Returns sorted indexes of kept points
+	"""
+	if ((tolerance is None) and (count is None)):
+		raise ValueError("Either a tolerance or a point count is required")
+	n = len(x)
+	if (n <= 2):
+		return np.arange(n)
+	
+	# initial areas, all at once
+	x = np.asarray(x, dtype=np.float64)
+	y = np.asarray(y, dtype=np.float64)
+	areas = np.zeros(n)
+	areas[1:-1] = 0.5*np.abs((x[:-2]-x[2:])*(y[1:-1]-y[2:]) - (x[1:-1]-x[2:])*(y[:-2]-y[2:]))
+	area = areas.tolist()
+	[x, y] = [x.tolist(), y.tolist()]
+	prev = list(range(-1, n-1))
+	next = list(range(1, n+1))
+	heap = [(area[i], i) for i in range(1, n-1)]
+	heapq.heapify(heap)
+
+	threshold = float("inf") if (tolerance is None) else tolerance**2
+	remaining = n
+	keep = [True]*n
+	while (len(heap) > 0):
+		[a, i] = heapq.heappop(heap)
+		if ((not(keep[i])) or (a != area[i])): # stale entry
+			continue
+		if (count is not None):
+			if (remaining <= count):
+				break
+		elif (a >= threshold):
+			break
+		keep[i] = False
+		remaining -= 1
+		[p, q] = [prev[i], next[i]]
+		next[p] = q
+		prev[q] = p
+		# neighbours area: never below the area just removed
+		for k in (p, q):
+			if ((k > 0) and (k < n-1)):
+				[u, v] = [prev[k], next[k]]
+				tri = 0.5*abs((x[u]-x[v])*(y[k]-y[v]) - (x[k]-x[v])*(y[u]-y[v]))
+				area[k] = max(tri, a)
+				heapq.heappush(heap, (area[k], k))
+	return np.flatnonzero(keep)
@@ -0,0 +1,113 @@
+import math
+import random
+import struct
+import datetime
+from Waypoint import *
+
+def sentence(body):
+	"""
+	Returns complete '$body*CS' sentence
+	"""
+	return "${:s}*{:s}".format(body, Waypoint.checksum("$"+body))
+
+def corrupt(line, rng):
+	"""
+	Returns line with a faulty checksum
+	"""
+	return line[:-2] + "{:02X}".format((int(line[-2:], 16)+1+rng.randrange(255))%256)
+
+def randomWalk(n, rate=1.0, seed=0, start=None, lat0=45.5, lon0=5.3, alt0=350.0, speed=3.0):
+	"""
+	Yields n [lat, lon, alt, date, speed (knots)] points of a
+	synthetic trip sampled at rate [Hz]: smooth heading & altitude
+	changes around speed [m/s]
+	"""
+	rng = random.Random(seed)
+	if (start is None):
+		start = datetime.datetime(2016, 7, 14, 9, 30, 0)
+	[lat, lon, alt] = [lat0, lon0, alt0]
+	heading = rng.uniform(0, 2*math.pi)
+	dt = 1.0/rate
+	for i in range(0, n):
+		v = max(0.0, speed + rng.gauss(0, 0.3))
+		yield [lat, lon, alt, start + datetime.timedelta(seconds=i*dt), v/0.514444]
+		heading += rng.gauss(0, 0.05)
+		lat += v*dt*math.cos(heading)/111320.0
+		lon += v*dt*math.sin(heading)/(111320.0*math.cos(math.radians(lat)))
+		alt += rng.gauss(0, 0.2)*dt + 0.05*math.sin(i*dt/60.0)
+
+def toDDMM(deg, isLongitude=False):
+	""" Returns NMEA (d)ddmm.mmmm & hemisphere """
+	hemisphere = ("W" if (deg < 0) else "E") if isLongitude else ("S" if (deg < 0) else "N")
+	deg = abs(deg)
+	D = int(deg)
+	return ["{:0{:d}d}{:07.4f}".format(D, 3 if isLongitude else 2, (deg-D)*60), hemisphere]
+
+def nmeaLines(n, rate=1.0, sentences=("GGA","RMC"), corrupted=0.0, noise=True, seed=0):
+	"""
+	Yields NMEA sentences of n synthetic epochs at rate [Hz].
+	sentences: sentences emitted per epoch, among GGA & RMC
+	corrupted: ratio of sentences with faulty checksum
+	noise: also emit (unsupported) $GPGSA sentences
+	"""
+	rng = random.Random(seed+1)
+	for [lat, lon, alt, date, knots] in randomWalk(n, rate, seed):
+		utc = date.strftime("%H%M%S.") + "{:03d}".format(date.microsecond//1000)
+		[la, ns] = toDDMM(lat)
+		[lo, ew] = toDDMM(lon, isLongitude=True)
+		for s in sentences:
+			if (s == "GGA"):
+				line = sentence("GPGGA,{:s},{:s},{:s},{:s},{:s},1,08,0.9,{:.1f},M,46.9,M,,".format(utc, la, ns, lo, ew, alt))
+			else:
+				line = sentence("GPRMC,{:s},A,{:s},{:s},{:s},{:s},{:.2f},84.4,{:s},003.1,W".format(utc, la, ns, lo, ew, knots, date.strftime("%d%m%y")))
+			if (rng.random() < corrupted):
+				line = corrupt(line, rng)
+			yield line
+		if (noise):
+			yield "$GPGSA,A,3,04,05,,09,12,,,24,,,,,2.5,1.3,2.1*39"
+
+def locusLines(n, rate=1.0, corrupted=0.0, seed=0):
+	"""
+	Yields a $PMTKLOX flash dump holding n synthetic records
+	(basic content), 6 records per data line
+	"""
+	rng = random.Random(seed+1)
+	records = bytearray()
+	for [lat, lon, alt, date, _] in randomWalk(n, rate, seed):
+		record = struct.pack("<IBffh", int((date-EPOCH).total_seconds()), 2, lat, lon, int(alt))
+		check = 0
+		for b in record:
+			check ^= b
+		records += record + bytes([check])
+
+	nlines = (len(records)+95)//96
+	yield sentence("PMTKLOX,0,{:d}".format(nlines))
+	for i in range(0, nlines):
+		hexa = records[i*96:(i+1)*96].hex().upper()
+		words = ",".join(hexa[j:j+8] for j in range(0, len(hexa), 8))
+		line = sentence("PMTKLOX,1,{:d},{:s}".format(i, words))
+		if (rng.random() < corrupted):
+			line = corrupt(line, rng)
+		yield line
+	yield sentence("PMTKLOX,2")
+
+def kmlLines(n, rate=1.0, seed=0):
+	"""
+	Yields a KML export of n synthetic points,
+	one coordinates tuple per line
+	"""
+	yield '<?xml version="1.0" encoding="UTF-8"?>'
+	yield '<kml xmlns="http://earth.google.com/kml/2.2">'
+	yield '<Placemark><LineString><coordinates>'
+	for [lat, lon, alt, _, _] in randomWalk(n, rate, seed):
+		yield "{:f},{:f},{:.1f}".format(lon, lat, alt)
+	yield '</coordinates></LineString></Placemark>'
+	yield '</kml>'
+
+def writeLines(fp, lines):
+	"""
+	Writes given lines into fp
+	"""
+	with open(fp, "w") as fd:
+		for line in lines:
+			fd.write(line+"\n")
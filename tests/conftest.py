@@ -0,0 +1,5 @@
+import os
+import sys
+
+# modules live flat in python/, as when run from there
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "python"))
@@ -0,0 +1,64 @@
+import os
+import numpy as np
+from GPSTrack import *
+from TrackCache import *
+from synthetic import *
+
+def writeLog(path, epochs, seed=0):
+	with open(path, "w") as fd:
+		fd.write("\r\n".join(nmeaLines(epochs, seed=seed)) + "\r\n")
+
+def test_cached_track_append_empty(tmp_path):
+	path = str(tmp_path / "log.nmea")
+	writeLog(path, 100)
+	cache = TrackCache(str(tmp_path / "cache"), minSize=0)
+	GPSTrack(path, cache=cache)
+	track = GPSTrack(path, cache=cache)
+	assert not(track._data["lat"].flags.writeable) # memory mapped
+	track.append([])
+	track.append(GPSTrack())
+	assert len(track) == 100
+	track.append(track[0])
+	assert len(track) == 101
+
+def test_key_taken_before_parse(tmp_path, monkeypatch):
+	path = str(tmp_path / "log.nmea")
+	writeLog(path, 100)
+	cache = TrackCache(str(tmp_path / "cache"), minSize=0)
+	parse = GPSTrack.parse
+	def growingParse(self, fp):
+		parse(self, fp)
+		with open(path, "a") as fd: # file grows after being read
+			fd.write("\r\n".join(nmeaLines(10, seed=1)) + "\r\n")
+	monkeypatch.setattr(GPSTrack, "parse", growingParse)
+	GPSTrack(path, cache=cache)
+	assert cache.load(path, PARSER_VERSION) is None # stale entry not served
+
+def test_undated_track_not_cached(tmp_path):
+	cache = TrackCache(str(tmp_path / "cache"), minSize=0)
+	dated = str(tmp_path / "dated.nmea")
+	writeLog(dated, 100)
+	undated = str(tmp_path / "undated.nmea")
+	with open(undated, "w") as fd: # GGA only: dated by today()
+		fd.write("\r\n".join(nmeaLines(100, sentences=("GGA",))) + "\r\n")
+	for path in [dated, undated]:
+		GPSTrack(path, cache=cache)
+	assert cache.load(dated, PARSER_VERSION) is not None
+	assert cache.load(undated, PARSER_VERSION) is None
+
+def test_entries_removed_concurrently(tmp_path, monkeypatch):
+	cache = TrackCache(str(tmp_path / "cache"), minSize=0)
+	for i in range(0, 3):
+		path = str(tmp_path / "log{:d}.nmea".format(i))
+		writeLog(path, 50, seed=i)
+		GPSTrack(path, cache=cache)
+	assert len(cache.entries()) == 3
+	scandir = os.scandir
+	def racingScandir(path):
+		for name in os.listdir(path): # evicted by another worker
+			os.remove(os.path.join(path, name))
+		os.rmdir(path)
+		return scandir(path)
+	monkeypatch.setattr(os, "scandir", racingScandir)
+	assert cache.entries() == []
+	cache.evict()
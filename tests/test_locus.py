@@ -0,0 +1,35 @@
+import numpy as np
+from LOCUS import *
+from synthetic import *
+
+def dataLines(n, seed=0):
+	return [l for l in locusLines(n, seed=seed) if l.startswith("$PMTKLOX,1,")]
+
+def reference(lines):
+	""" Payload decoded one line at a time """
+	chunks = []
+	for line in lines:
+		if ((line[-3:-2] != "*") or (line[-2:].upper() != Waypoint.checksum(line))):
+			continue
+		try:
+			chunks.append(bytes.fromhex(line[:-3].split(",", 3)[3].replace(",", "")))
+		except (ValueError, IndexError):
+			pass
+	return b"".join(chunks)
+
+def test_payload():
+	lines = dataLines(2000)
+	assert locusPayload(lines) == reference(lines)
+	assert len(locusPayload(lines)) == 2000*RECORD.itemsize
+	assert locusPayload([]) == b""
+
+def test_payload_faulty_lines():
+	lines = dataLines(2000, seed=1)
+	sentence = lambda body: body + "*" + Waypoint.checksum(body)
+	lines[3] = lines[3][:-2] + "00" if (lines[3][-2:] != "00") else lines[3][:-2] + "01"
+	lines[5] = lines[5][:-3] # no checksum
+	lines[7] = sentence(lines[7][:-4]) # odd digit count, valid checksum
+	lines[9] = sentence(lines[9][:-3].replace("0", "G", 1)) # not hex, valid checksum
+	lines[11] = sentence("$PMTKLOX,1,11") # no payload
+	assert locusPayload(lines) == reference(lines)
+	assert locusPayload(lines[:3] + lines[4:5]) == reference(lines[:3] + lines[4:5])
@@ -0,0 +1,52 @@
+import numpy as np
+from NMEA import *
+from GPSTrack import *
+from synthetic import *
+
+def epochs(lines):
+	""" Groups GGA/RMC/GSA lines of nmeaLines() by epoch """
+	grouped = []
+	for line in lines:
+		if (line.startswith("$GPGGA")):
+			grouped.append([])
+		grouped[-1].append(line)
+	return grouped
+
+def test_dropped_gga_keeps_last_altitude():
+	grouped = epochs(nmeaLines(50, sentences=("GGA","RMC"), seed=4))
+	dropped = [0, 1, 10, 11, 30, 49]
+	lines = []
+	for (i, epoch) in enumerate(grouped):
+		lines += [l for l in epoch if not((i in dropped) and l.startswith("$GPGGA"))]
+	fixes = list(iterNMEA(iter(lines)))
+	reference = list(iterNMEA(iter(sum(grouped, []))))
+	assert len(fixes) == len(reference) == 50
+	for (i, fix) in enumerate(fixes):
+		assert fix.time == reference[i].time
+		assert fix.alt != 0.0
+		if (i in dropped):
+			# last known altitude, first one for leading epochs
+			j = i
+			while (j in dropped):
+				j = j-1 if (j > 0) else 2
+			assert fix.alt == reference[j].alt
+		else:
+			assert fix.alt == reference[i].alt
+
+def test_corrupted_log_elevation(tmp_path):
+	fp = str(tmp_path / "corrupted.nmea")
+	writeLines(fp, nmeaLines(2000, sentences=("GGA","RMC"), corrupted=0.02, seed=1))
+	track = GPSTrack(fp, cache=False)
+	alt = track.column("alt")
+	assert np.all(alt > 300)
+	assert alt[track.lowestPoint()] == alt.min()
+	# random walk: ascent stays in the range of a clean log
+	clean = str(tmp_path / "clean.nmea")
+	writeLines(clean, nmeaLines(2000, sentences=("GGA","RMC"), seed=1))
+	expected = GPSTrack(clean, cache=False).elevationSummary().ascent
+	assert abs(track.elevationSummary().ascent - expected) < 0.1*expected
+
+def test_rmc_only_log_has_zero_altitude():
+	fixes = list(iterNMEA(iter(nmeaLines(20, sentences=("RMC",), seed=2))))
+	assert len(fixes) == 20
+	assert all(fix.alt == 0.0 for fix in fixes)
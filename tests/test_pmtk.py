@@ -0,0 +1,66 @@
+import sys
+import time
+from PMTK import *
+from PMTKSimulator import *
+
+def dump(sim):
+	totals = []
+	with sim:
+		gps = PMTK(sim.open())
+		track = gps.dumpFlash(progress=lambda lines, total: totals.append(total), timeout=0.5)
+	return [track, totals]
+
+def test_dump_flash_progress():
+	[track, totals] = dump(PMTKSimulator(rate=0, epochs=0, flash=500))
+	assert len(track) == 500
+	assert totals[-1] > 0
+
+def test_dump_flash_faulty_header(monkeypatch):
+	locus = locusLines
+	def faultyHeader(*args, **kwargs):
+		for line in locus(*args, **kwargs):
+			if (line.startswith("$PMTKLOX,0,")):
+				line = line[:-2] + ("00" if (line[-2:] != "00") else "01")
+			yield line
+	monkeypatch.setattr(sys.modules["PMTKSimulator"], "locusLines", faultyHeader)
+	[track, totals] = dump(PMTKSimulator(rate=0, epochs=0, flash=500))
+	assert len(track) == 500 # records still decoded
+	assert all(total == 0 for total in totals)
+
+def test_answers_matched_through_noise():
+	with PMTKSimulator(rate=0, epochs=0, noise=0.5, seed=3) as sim:
+		gps = PMTK(sim.open())
+		for i in range(0, 20):
+			start = time.monotonic()
+			answer = gps.sendCommand(PMTK_Q_RELEASE)
+			assert answer.startswith("$PMTK705,")
+			assert time.monotonic() - start < 0.5 # no resend
+		assert sim.commands == 20
+
+def test_pipelined_answers_in_order():
+	batch = [PMTK_Q_RELEASE, PMTK_STATUS_QUERY, PMTK_API_Q_FIX_CTRL, PMTK_ENABLE_SBAS, PMTK_Q_RELEASE]
+	with PMTKSimulator(rate=10, epochs=100, latency=0.05) as sim:
+		gps = PMTK(sim.open())
+		start = time.monotonic()
+		answers = gps.sendCommands(batch)
+		assert time.monotonic() - start < 0.5 # one round trip
+		assert sim.commands == len(batch)
+	assert [a.split(",")[0] for a in answers] == ["$PMTK705", "$PMTKLOG", "$PMTK500", "$PMTK001", "$PMTK705"]
+	assert answers[3].startswith("$PMTK001,313,3*")
+
+def test_commands_without_answer():
+	with PMTKSimulator(rate=0, epochs=0) as sim:
+		gps = PMTK(sim.open())
+		start = time.monotonic()
+		assert gps.sendCommands([PGCMD_ANTENNA, PMTK_SET_BAUD_9600, PMTK_Q_RELEASE])[:2] == ["", ""]
+		assert time.monotonic() - start < 0.5
+		assert sim.commands == 2 # $PGCMD is not a PMTK command, sent once
+
+def test_faulty_answer_checksum():
+	gps = PMTK.__new__(PMTK)
+	assert gps.answerKey("$PMTK001,605,3*31") is None
+	assert gps.answerKey(sentence("PMTK001,605,3")) == "$PMTK001,605"
+
+def test_dump_flash_through_noise():
+	[track, totals] = dump(PMTKSimulator(rate=0, epochs=0, flash=2000, noise=0.2, seed=5))
+	assert len(track) == 2000
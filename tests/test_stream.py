@@ -0,0 +1,40 @@
+import os
+import asyncio
+from NMEAStream import *
+from PMTKSimulator import *
+
+async def collect(stream, n):
+	fixes = []
+	async for fix in stream:
+		fixes.append(fix)
+		if (len(fixes) == n):
+			break
+	return fixes
+
+def test_stream_with_given_loop():
+	loop = asyncio.new_event_loop()
+	try:
+		with PMTKSimulator(rate=0, epochs=50) as sim:
+			fd = os.open(sim.open(), os.O_RDWR | os.O_NOCTTY)
+			try:
+				stream = NMEAStream(fd, loop=loop)
+				fixes = loop.run_until_complete(asyncio.wait_for(collect(stream, 50), 5.0))
+				stream.close()
+			finally:
+				os.close(fd)
+	finally:
+		loop.close()
+	assert len(fixes) == 50
+	assert all(b.time > a.time for (a, b) in zip(fixes, fixes[1:]))
+
+def test_stream_from_pipe():
+	[r, w] = os.pipe()
+	os.write(w, "".join(line+"\r\n" for line in nmeaLines(20, seed=2)).encode("ascii"))
+	os.close(w)
+	loop = asyncio.new_event_loop()
+	try:
+		fixes = loop.run_until_complete(asyncio.wait_for(collect(NMEAStream(r, loop=loop), -1), 5.0))
+	finally:
+		loop.close()
+		os.close(r)
+	assert len(fixes) == 20
@@ -0,0 +1,61 @@
+import numpy as np
+from GPSTrack import *
+from synthetic import *
+
+def waypoints(n, seed=0):
+	return [Waypoint(latDeg=lat, lonDeg=lon, alt=alt, date=date)
+		for [lat, lon, alt, date, _] in randomWalk(n, seed=seed)]
+
+def statistics(track):
+	return [
+		np.array(track.accumulatedDistance()),
+		np.array(track.accumulatedAscent()),
+		np.array(track.accumulatedDescent()),
+		track.elevationProfile(),
+		track.highestPoint(),
+		track.lowestPoint(),
+		track.totalDistance(),
+	]
+
+def check(track):
+	""" Memoized statistics match the ones of a fresh track """
+	fresh = GPSTrack()
+	fresh.extend(Fix(*[np.array(c) for c in track.columns()]))
+	for (memoized, expected) in zip(statistics(track), statistics(fresh)):
+		np.testing.assert_allclose(memoized, expected, rtol=1e-9, atol=1e-6)
+
+def test_memoized_after_edits():
+	track = GPSTrack()
+	track.append(waypoints(200))
+	statistics(track)
+	track.append(waypoints(50, seed=1))
+	check(track)
+	track.insert(20, waypoints(10, seed=2))
+	check(track)
+	wp = track[100]
+	wp.alt += 500.0
+	track[100] = wp
+	check(track)
+	del track[30]
+	check(track)
+	del track[-5:]
+	check(track)
+	track.append(waypoints(5, seed=3))
+	check(track)
+
+def test_returned_arrays_not_rewritten():
+	track = GPSTrack()
+	track.append(waypoints(100))
+	[distance, ascent] = [track.accumulatedDistance(), track.accumulatedAscent()]
+	[d, a] = [np.array(distance), np.array(ascent)]
+	wp = track[5]
+	wp.alt += 100.0
+	wp.latDeg += 0.01
+	track[5] = wp
+	track.accumulatedDistance()
+	track.accumulatedAscent()
+	np.testing.assert_array_equal(distance, d)
+	np.testing.assert_array_equal(ascent, a)
+	track.append(waypoints(10, seed=1))
+	np.testing.assert_array_equal(track.accumulatedDistance()[:5], d[:5])
+	np.testing.assert_array_equal(distance, d)